@@ -9,6 +9,7 @@ import pandas as pd
 from sentence_transformers import SentenceTransformer
 
 from .config import settings
+from .pdb_embed_search import top_k_indices
 
 
 @dataclass
@@ -88,9 +89,9 @@ class Ingestor:
     def _build_inverted_index(self) -> None:
         token_df = self._load_tokens()
         index: dict[str, set[int]] = {}
-        for _, row in token_df.iterrows():
-            mid = int(row.message_id)
-            for th in row.token_hashes:
+        for mid, hashes in token_df[["message_id", "token_hashes"]].itertuples(index=False, name=None):
+            mid = int(mid)
+            for th in hashes:
                 index.setdefault(th, set()).add(mid)
         self._inverted_index = index
 
@@ -198,11 +199,15 @@ class Ingestor:
         if filtered.empty:
             return []
         q = np.array(query_vec)
-        mat = np.vstack(filtered.vector.to_list())
+        # Fill one preallocated float32 matrix instead of list -> vstack -> cast copies
+        vecs = filtered.vector
+        mat = np.empty((len(vecs), len(vecs.iloc[0])), dtype=np.float32)
+        for i, v in enumerate(vecs):
+            mat[i] = v
         # cosine similarity
-        denom = (np.linalg.norm(mat, axis=1) * (np.linalg.norm(q) + 1e-9))
+        denom = (np.sqrt(np.einsum("ij,ij->i", mat, mat)) * (np.sqrt(np.vdot(q, q)) + 1e-9))
         scores = (mat @ q) / (denom + 1e-9)
-        idx = np.argsort(-scores)[:top_k]
+        idx = top_k_indices(scores, top_k)
         results = []
         for i in idx:
             row = filtered.iloc[int(i)]
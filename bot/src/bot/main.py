@@ -68,19 +68,19 @@ def summarize_theory(topic: str, model, docs: list[dict]) -> str:
     if docs:
         try:
             import numpy as np
+            from .pdb_embed_search import top_k_indices
             raw_q = model.encode(topic)
             # Support both list and numpy array returns
             if hasattr(raw_q, "tolist"):
                 raw_q = raw_q.tolist()
             q_vec = np.array(raw_q, dtype=float)
-            mat = np.vstack([
-                (d["embedding"].tolist() if hasattr(d["embedding"], "tolist") else d["embedding"])  # type: ignore[index]
-                for d in docs
-            ]).astype(float)
+            mat = np.empty((len(docs), len(docs[0]["embedding"])), dtype=float)  # type: ignore[index]
+            for i, d in enumerate(docs):
+                mat[i] = d["embedding"]  # type: ignore[index]
             # Normalize cosine similarity
-            denom = (np.linalg.norm(mat, axis=1) * (np.linalg.norm(q_vec) + 1e-9))
+            denom = (np.sqrt(np.einsum("ij,ij->i", mat, mat)) * (np.sqrt(np.vdot(q_vec, q_vec)) + 1e-9))
             scores = (mat @ q_vec) / (denom + 1e-9)
-            top_idx = np.argsort(-scores)[: settings.retrieval_top_k]
+            top_idx = top_k_indices(scores, settings.retrieval_top_k)
             for i in top_idx:
                 doc = docs[int(i)]
                 aug_lines.append(f"Doc:{doc['path']} sim:{scores[int(i)]:.3f}")
@@ -61,16 +61,20 @@ def canonical_json_bytes(obj: Any) -> bytes:
     return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
 
 
-def cid_from_object(obj: Any) -> str:
-    content = canonical_json_bytes(obj)
+def cid_from_bytes(content: bytes) -> str:
+    """CID for already-canonical bytes (see canonical_json_bytes)."""
     cid = _cid.get_cid(content)
     if not _is_valid_cid_module(cid):
         cid = _create_cid_from_bytes(content)
     return cid
 
 
+def cid_from_object(obj: Any) -> str:
+    return cid_from_bytes(canonical_json_bytes(obj))
+
+
 def is_valid_cid(cid: str) -> bool:
     return _is_valid_cid_module(cid)
 
 
-__all__ = ["cid_from_object", "is_valid_cid", "canonical_json_bytes"]
+__all__ = ["cid_from_object", "cid_from_bytes", "is_valid_cid", "canonical_json_bytes"]
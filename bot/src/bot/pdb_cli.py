@@ -1,55 +1,504 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
+import os
+import time
 from typing import Optional
 
 import numpy as np
 import orjson
 
 from .pdb_client import PdbClient
-from .pdb_storage import PdbStorage
+from .pdb_cid import cid_from_bytes
+from .pdb_storage import PdbStorage, _content_bytes
 from .pdb_embed_search import embed_texts, cosine_topk
 from .pdb_normalize import normalize_profile
 from .pdb_analysis import analyze_kl
 
 
+def _decode(pb, _loads=orjson.loads, _errors=orjson.JSONDecodeError) -> Optional[dict]:
+    """Decode a stored payload (JSON bytes/str, or an already-decoded dict)."""
+    # Stored payloads are almost always bytes: hand them straight to orjson (which also
+    # takes bytearray/memoryview/str) and only type-check on the rare failure path.
+    # orjson raises JSONDecodeError for non-JSON input types too (dicts, None, ints).
+    try:
+        obj = _loads(pb)
+    except _errors:
+        return pb if type(pb) is dict else None
+    return obj if type(obj) is dict else None
+
+
+_PID_KEYS = ("id", "profileId", "profileID", "profile_id")
+# Raw payloads may only carry the provenance id added at ingest
+_PAYLOAD_PID_KEYS = _PID_KEYS + ("_profile_id",)
+
+
+def _get_pid(obj: dict, _keys: tuple = _PID_KEYS) -> Optional[int]:
+    """First int-like id under ``_keys`` (ints or all-digit strings), else None."""
+    for k in _keys:
+        v = obj.get(k)
+        t = type(v)
+        if t is int:
+            return v
+        if t is str and v.isdigit():
+            return int(v)
+    return None
+
+
+def _as_int(v) -> Optional[int]:
+    """``int(v)`` when int() accepts it (floats, signed or padded strings), else None."""
+    if type(v) is int:
+        return v
+    if v is None:
+        return None
+    try:
+        return int(v)
+    except Exception:
+        return None
+
+
+def _iter_raw_rows(raw_path, columns=("payload_bytes",), batch_size: int = 65536):
+    """Yield row tuples of ``columns`` from a parquet file, one record batch at a time.
+
+    Only the requested columns are read and at most one batch is materialized as
+    Python objects, unlike read_parquet + itertuples over the whole table.
+    """
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(raw_path, memory_map=True)
+    for rb in pf.iter_batches(batch_size=batch_size, columns=list(columns)):
+        yield from zip(*(col.to_pylist() for col in rb.columns))
+
+
+def _filter_names_containing(table, needle: str, column: str = "name"):
+    """Keep rows of an Arrow table whose ``column`` contains ``needle`` (any case).
+
+    A vectorized prefilter over the decoded name column; callers still apply their
+    exact Python check. Non-ASCII needles skip it, as Arrow's case folding may
+    differ from str.lower().
+    """
+    if not needle or not needle.isascii():
+        return table
+    try:
+        import pyarrow.compute as pc
+
+        mask = pc.fill_null(pc.match_substring(table.column(column), needle, ignore_case=True), False)
+        return table.filter(mask)
+    except Exception:
+        return table
+
+
+def _for_annotation(it: dict, emitted: set[int]) -> dict:
+    """Return ``it`` itself for in-place annotation, or a copy if it was already emitted.
+
+    Decoded API payloads are owned by the caller, so items are tagged in place; a dict
+    reachable from two lists (e.g. recommendProfiles merged into profiles) is copied
+    on its second use so each emitted record keeps its own provenance.
+    """
+    if id(it) in emitted:
+        return dict(it)
+    emitted.add(id(it))
+    return it
+
+
+@functools.lru_cache(maxsize=1)
+def _store() -> PdbStorage:
+    """The process-wide PdbStorage (it only resolves paths; writes lock on their own)."""
+    return PdbStorage()
+
+
+# PdbClient instances shared within one CLI process, keyed by their constructor settings
+_CLIENTS: dict[bytes, PdbClient] = {}
+
+
+def _shared_client(**kwargs) -> PdbClient:
+    """PdbClient for ``kwargs``, reused for identical settings; _run_async closes them all."""
+    try:
+        key = orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS)
+    except Exception:
+        client = PdbClient(**kwargs)
+        _CLIENTS[b"id:%d" % id(client)] = client
+        return client
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _CLIENTS[key] = PdbClient(**kwargs)
+    return client
+
+
+def _run_async(coro):
+    """asyncio.run(coro), closing every shared client's connection pool before the loop ends.
+
+    Shared clients outlive a single handler, so their httpx pools are closed here on
+    the loop that opened them rather than by each handler.
+    """
+    async def _main():
+        try:
+            return await coro
+        finally:
+            for client in list(_CLIENTS.values()):
+                await client.aclose()
+
+    return asyncio.run(_main())
+
+
+def _known_cids(store: PdbStorage) -> set:
+    """Content ids already in the raw store, read from the decoded sidecar."""
+    try:
+        return set(store.load_decoded(["cid"]).column("cid").to_pylist())
+    except Exception:
+        return set()
+
+
+def _count_new(batch: list[dict], known: set) -> int:
+    """Count items whose content cid is not in ``known`` yet, adding them to it.
+
+    Matches the "new" count upsert_raw would return for the page, so pagers can detect
+    "no progress" pages without writing each page to the store first.
+    """
+    new = 0
+    for it in batch:
+        cid = cid_from_bytes(_content_bytes(it))
+        if cid not in known:
+            known.add(cid)
+            new += 1
+    return new
+
+
+async def _fetch_related_lists(client: PdbClient, sids: list[int]) -> list[list]:
+    """Fetch ``profiles/{sid}/related`` for every sid concurrently, in input order.
+
+    Failed or malformed responses yield an empty list. Concurrency and request rate
+    are bounded by the client's own semaphore and throttle.
+    """
+    async def _one(sid: int) -> list:
+        try:
+            rel = await client.fetch_json(f"profiles/{sid}/related")
+        except Exception:
+            return []
+        rel_payload = rel.get("data") if isinstance(rel, dict) else rel
+        rel_list = []
+        if isinstance(rel_payload, dict):
+            rel_list = rel_payload.get("relatedProfiles") or rel_payload.get("profiles") or []
+        return rel_list if isinstance(rel_list, list) else []
+
+    return list(await asyncio.gather(*(_one(sid) for sid in sids)))
+
+
+# "auto" keeps an exact flat scan for small stores, switches to an HNSW graph once a
+# flat scan gets slow, and to compressed IVF-PQ once full float32 rows get too big
+_HNSW_MIN_VECTORS = 50_000
+_IVFPQ_MIN_VECTORS = 1_000_000
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq", "sq8", "sqfp16")
+# Rows normalized and added per FAISS add() call
+_ADD_CHUNK = 50_000
+
+
+def _build_cosine_index(vectors, index_type: str = "auto"):
+    """FAISS inner-product index over L2-normalized ``vectors`` (cosine similarity).
+
+    ``index_type``: flat (exact), hnsw (graph), ivf (inverted lists over sqrt(N)
+    centroids), ivfpq (ivf with ~d/8-byte product-quantized codes instead of full
+    float32 rows), sq8 (exact scan over int8 scalar-quantized rows, 4x smaller), sqfp16
+    (exact scan over float16 rows, 2x smaller, no training) or
+    auto (flat below _HNSW_MIN_VECTORS, hnsw below _IVFPQ_MIN_VECTORS, else ivfpq).
+    """
+    import math
+    import faiss  # type: ignore
+
+    n = len(vectors)
+    d = (vectors.shape[1] if isinstance(vectors, np.ndarray) and vectors.ndim == 2 else len(vectors[0])) if n else 0
+    if not os.getenv("OMP_NUM_THREADS") and hasattr(os, "sched_getaffinity"):
+        # Training and add() run on FAISS's OpenMP pool; size it to the CPUs this
+        # process may actually run on (taskset/cgroup cpusets), not the host count
+        faiss.omp_set_num_threads(len(os.sched_getaffinity(0)) or 1)
+
+    def _block(rows) -> np.ndarray:
+        # One writable float32 block per chunk (a copy even of a read-only memmap),
+        # normalized in place by FAISS; rows may be a slice or a list of indices
+        if isinstance(vectors, np.ndarray) and vectors.ndim == 2:
+            out = np.array(vectors[rows], dtype=np.float32, order="C")
+        else:
+            idx = range(n)[rows] if isinstance(rows, slice) else rows
+            out = np.empty((len(idx), d), dtype=np.float32)
+            for j, i in enumerate(idx):
+                out[j] = vectors[i]
+        faiss.normalize_L2(out)
+        return out
+
+    def _train(index, nlist: int) -> None:
+        # Train on an evenly strided sample (FAISS wants ~39-256 points per centroid)
+        # rather than the full matrix
+        m = min(n, max(nlist * 256, 256 * 39))
+        index.train(_block(np.linspace(0, n - 1, m).astype(np.int64).tolist() if m < n else slice(0, n)))
+
+    if index_type == "auto":
+        index_type = "ivfpq" if n >= _IVFPQ_MIN_VECTORS else "hnsw" if n >= _HNSW_MIN_VECTORS else "flat"
+    if index_type == "ivfpq" and n < 256:
+        # 8-bit PQ codebooks need at least 256 training vectors
+        index_type = "ivf"
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = 64
+    elif index_type == "ivf":
+        nlist = max(1, int(math.sqrt(n)))
+        quant = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFFlat(quant, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        _train(index, nlist)
+        # nprobe is saved with the index; probe a few lists so recall stays close to flat
+        index.nprobe = min(nlist, 16)
+    elif index_type == "ivfpq":
+        nlist = max(1, int(math.sqrt(n)))
+        # sub-quantizer count must divide d; aim for one byte per 8 dimensions
+        m = max(1, d // 8)
+        while d % m:
+            m -= 1
+        quant = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFPQ(quant, d, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+        _train(index, nlist)
+        index.nprobe = min(nlist, max(16, nlist // 32))
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        _train(index, 1)
+    elif index_type == "sqfp16":
+        # float16 needs no codebook: cosine scores on unit vectors barely move
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(d)
+    # Add in fixed-size chunks so peak extra memory is one chunk, not a full copy
+    for i in range(0, n, _ADD_CHUNK):
+        index.add(_block(slice(i, i + _ADD_CHUNK)))
+    return index
+
+
+def _tune_for_k(index, k: int, nprobe: Optional[int] = None) -> None:
+    """Widen an HNSW index's search beam so a k-result query keeps its recall, and
+    apply an explicit ``nprobe`` to IVF indexes."""
+    hnsw = getattr(index, "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = max(int(hnsw.efSearch), 2 * int(k), 64)
+    if nprobe and hasattr(index, "nprobe"):
+        index.nprobe = max(1, min(int(nprobe), int(index.nlist)))
+
+
+def _maybe_to_gpu(index, use_gpu: bool):
+    """Move ``index`` to GPU 0 when asked and a GPU build of FAISS sees one; else as-is."""
+    if not use_gpu:
+        return index
+    import faiss  # type: ignore
+
+    try:
+        if faiss.get_num_gpus() > 0:
+            return faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+        print("Note: --gpu requested but no GPU is visible to FAISS; searching on CPU.")
+    except Exception as e:
+        # CPU-only builds lack the GPU API; HNSW has no GPU implementation
+        print(f"Note: GPU search unavailable ({e}); searching on CPU.")
+    return index
+
+
+def _write_cosine_index(vectors, cids: list[str], outp, index_type: str = "auto") -> None:
+    """Build a cosine index over ``vectors`` and write it to ``outp`` plus its cid map."""
+    import faiss  # type: ignore
+
+    index = _build_cosine_index(vectors, index_type)
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(outp))
+    _write_cid_map(outp, cids)
+
+
+def _write_cid_map(idxp, cids: list[str]) -> None:
+    """Write the index row -> cid map next to ``idxp`` as an Arrow IPC file (.cids.arrow)."""
+    import pyarrow as pa
+
+    table = pa.table({"cid": pa.array(cids, type=pa.string())})
+    with pa.OSFile(str(idxp.with_suffix(idxp.suffix + ".cids.arrow")), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Drop a plaintext map left by older builds so it cannot go stale next to the new one
+    idxp.with_suffix(idxp.suffix + ".cids").unlink(missing_ok=True)
+
+
+def _read_cid_map(idxp) -> Optional[list[str]]:
+    """Index row -> cid map for the FAISS index at ``idxp``, or None when missing.
+
+    Reads the memory-mapped .cids.arrow file, falling back to the newline-separated
+    .cids text map written by older builds.
+    """
+    path = idxp.with_suffix(idxp.suffix + ".cids.arrow")
+    if path.exists():
+        import pyarrow as pa
+
+        with pa.memory_map(str(path)) as src:
+            return pa.ipc.open_file(src).read_all().column("cid").to_pylist()
+    legacy = idxp.with_suffix(idxp.suffix + ".cids")
+    if legacy.exists():
+        return legacy.read_text(encoding="utf-8").splitlines()
+    return None
+
+
+class _Flusher:
+    """Buffer raw records and upsert them in large batches on a worker thread.
+
+    Every upsert_raw call rewrites the whole raw parquet, so one call per page or
+    per seed is far more expensive than a few large ones. A full batch is written in
+    the background so producers keep fetching; at most one write is in flight, since
+    each one rewrites the same file.
+
+    A batch is also sealed early once it holds ``max_bytes`` of serialized JSON or
+    its oldest item has waited ``max_secs`` (either 0 = no limit).
+    """
+
+    def __init__(self, store: PdbStorage, batch_size: int = 2000, max_bytes: int = 0, max_secs: float = 0.0) -> None:
+        self.store = store
+        self.batch_size = max(int(batch_size or 1), 1)
+        self.max_bytes = max(int(max_bytes or 0), 0)
+        self.max_secs = max(float(max_secs or 0.0), 0.0)
+        self.buf: list[dict] = []
+        self._bytes = 0
+        self._since = 0.0
+        self.new = 0
+        self.updated = 0
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, items: list[dict]) -> None:
+        if not self.buf:
+            self._since = time.monotonic()
+        self.buf.extend(items)
+        if self.max_bytes:
+            self._bytes += sum(len(orjson.dumps(it)) for it in items)
+        if (
+            len(self.buf) >= self.batch_size
+            or (self.max_bytes and self._bytes >= self.max_bytes)
+            or (self.max_secs and time.monotonic() - self._since >= self.max_secs)
+        ):
+            await self._start_write()
+
+    async def _start_write(self) -> None:
+        async with self._lock:
+            await self._drain()
+            if not self.buf:
+                return
+            batch, self.buf = self.buf, []
+            self._bytes = 0
+            self._pending = asyncio.create_task(asyncio.to_thread(self.store.upsert_raw, batch))
+
+    async def _drain(self) -> None:
+        task, self._pending = self._pending, None
+        if task is not None:
+            n, u = await task
+            self.new += n
+            self.updated += u
+
+    async def flush(self) -> None:
+        """Write whatever is buffered and wait for every pending write."""
+        await self._start_write()
+        async with self._lock:
+            await self._drain()
+
+
 def cmd_search(query: str, top_k: int = 5) -> None:
-    store = PdbStorage()
-    df = store.load_joined()
-    if df.empty:
+    import pyarrow.parquet as pq
+
+    store = _store()
+    if not store.raw_path.exists():
         print("No data.")
         return
-    rows = df.dropna(subset=["vector"]).reset_index(drop=True)
-    if rows.empty: 
+    cids, mat = store.load_vector_matrix()
+    if not cids:
         print("No vectors found. Run embed first.")
         return
-    mat = np.vstack(rows["vector"].to_list())
     qv = embed_texts([query])[0]
     q = np.array(qv)
     idx, scores = cosine_topk(mat, q, top_k)
-    for rank, (i, s) in enumerate(zip(idx, scores), start=1):
-        r = rows.iloc[int(i)]
-        pb = r.get("payload_bytes")
-        obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else pb
+    # Decode payloads only for the hits
+    top_cids = [cids[int(i)] for i in idx]
+    hits = pq.read_table(store.raw_path, columns=["cid", "payload_bytes"], filters=[("cid", "in", top_cids)])
+    payloads = dict(zip(hits.column("cid").to_pylist(), hits.column("payload_bytes").to_pylist()))
+    for rank, (cid, s) in enumerate(zip(top_cids, scores), start=1):
+        obj = _decode(payloads.get(cid)) or {}
         name = obj.get("name") or obj.get("title") or obj.get("username") or "(unknown)"
-        print(f"{rank}. cid={r['cid'][:12]} score={s:.4f} name={name}")
+        print(f"{rank}. cid={cid[:12]} score={s:.4f} name={name}")
 
 
-def _pick_name(obj: dict) -> str:
-    for k in ("name", "title", "display_name", "username", "subcategory"):
-        v = obj.get(k)
-        if isinstance(v, str) and v:
+_NAME_KEYS = ("name", "title", "display_name", "username", "subcategory")
+
+
+def _pick_name(obj: dict, _keys: tuple = _NAME_KEYS) -> str:
+    get = obj.get
+    for k in _keys:
+        v = get(k)
+        if type(v) is str and v:
             return v
     return "(unknown)"
 
 
-def cmd_embed(args) -> None:
-    store = PdbStorage()
+def _embed_text(pb, aliases: Optional[list] = None, include_context: bool = False) -> Optional[str]:
+    """Embedding text for one raw payload (name + optional aliases/context), or None.
+
+    Module-level so cmd_embed can map it over a process pool.
+    """
+    obj = _decode(pb)
+    if obj is None:
+        return None
+    name = _pick_name(obj)
+    # Fallbacks: prefer human label sources when typical fields are absent
+    if name == "(unknown)":
+        kw = obj.get("_search_keyword") or obj.get("_keyword")
+        if isinstance(kw, str) and kw.strip():
+            name = kw.strip()
+        else:
+            st = obj.get("_seed_profile_title")
+            if isinstance(st, str) and st.strip():
+                name = st.strip()
+            else:
+                try:
+                    seed_url = obj.get("_seed_url")
+                    if isinstance(seed_url, str) and ("?" in seed_url):
+                        from urllib.parse import urlparse as _uparse, parse_qs as _pq, unquote as _unq
+                        q = _pq(_uparse(seed_url).query)
+                        val = None
+                        for kk in ("keyword", "q"):
+                            arr = q.get(kk) or []
+                            if arr:
+                                val = arr[0]; break
+                        if isinstance(val, str) and val:
+                            name = _unq(val).strip() or name
+                except Exception:
+                    pass
+    if not name:
+        return None
+    # Build embedding text: name + optional aliases/context
+    txt_parts: list[str] = [name]
+    if aliases:
+        # avoid duplicating main name
+        for a in aliases:
+            if a and a != name:
+                txt_parts.append(a)
+    if include_context:
+        # include keyword and seed title if present
+        for k in ("_search_keyword", "_keyword", "_seed_profile_title"):
+            v = obj.get(k)
+            if isinstance(v, str) and v.strip() and v not in txt_parts:
+                txt_parts.append(v.strip())
+    return " | ".join(txt_parts)
+
+
+def cmd_embed(args=None, store: Optional[PdbStorage] = None):
+    """Embed rows that lack vectors (or all selected rows with --force).
+
+    Returns the full joined frame with the new vectors filled in, so callers that
+    go on to build an index need not read the parquet files again.
+    """
+    store = store or _store()
     df = store.load_joined()
     if df.empty:
         print("No raw data to embed.")
-        return
+        return df
+    joined = df
     # Optionally restrict to characters-only cids and prepare alias map
     alias_map: dict[str, list[str]] = {}
     if getattr(args, "chars_only", False):
@@ -59,15 +508,13 @@ def cmd_embed(args) -> None:
             cpath = _Path("data/bot_store/pdb_characters.parquet")
             if not cpath.exists():
                 print(f"Missing characters parquet: {cpath}. Run export-characters first or omit --chars-only.")
-                return
+                return joined
             cdf = _pd.read_parquet(cpath)
             df = df.merge(cdf[["cid"]], on="cid", how="inner")
             # Build alias map if requested
             if getattr(args, "include_aliases", False) and "alt_names" in cdf.columns:
-                for _, r in cdf.iterrows():
-                    scid = str(r.get("cid"))
-                    nm = r.get("name")
-                    alt = r.get("alt_names")
+                for rcid, nm, alt in cdf.reindex(columns=["cid", "name", "alt_names"]).itertuples(index=False, name=None):
+                    scid = str(rcid)
                     pieces: list[str] = []
                     if isinstance(nm, str) and nm.strip():
                         pieces.append(nm.strip())
@@ -77,86 +524,83 @@ def cmd_embed(args) -> None:
                         alias_map[scid] = pieces
         except Exception as e:
             print(f"Failed to load characters parquet: {e}")
-            return
-    # Select rows to embed
+            return joined
+    # Select rows to embed: mask the two needed columns as arrays instead of copying
+    # the frame (and its vector lists) with df[mask]
     force = bool(getattr(args, "force", False))
+    row_cids = df["cid"].to_numpy()
+    payloads = df["payload_bytes"].to_numpy()
     if not force:
-        try:
-            mask = df["vector"].isna()
-        except Exception:
-            mask = [True] * len(df)
-        rows = df[mask].reset_index(drop=True)
-        if rows.empty:
+        if "vector" in df.columns:
+            mask = df["vector"].isna().to_numpy()
+            row_cids, payloads = row_cids[mask], payloads[mask]
+        if not len(row_cids):
             print("All selected rows already have vectors. Use --force to overwrite.")
-            return
+            return joined
+    include_aliases = bool(getattr(args, "include_aliases", False))
+    row_ids = [str(c) for c in row_cids]
+    row_aliases = [alias_map.get(c) for c in row_ids] if include_aliases else [None] * len(row_ids)
+    build = functools.partial(_embed_text, include_context=bool(getattr(args, "include_context", False)))
+    # Decoding and text building is pure CPU; fan it out over processes for large runs
+    workers = os.cpu_count() or 1
+    if workers > 1 and len(row_ids) >= 100_000:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = list(pool.map(build, payloads, row_aliases, chunksize=1000))
     else:
-        rows = df.reset_index(drop=True)
+        built = list(map(build, payloads, row_aliases))
     texts: list[str] = []
     ids: list[str] = []
-    for _, row in rows.iterrows():
-        pb = row.get("payload_bytes")
-        try:
-            obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (
-                json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None)
-            )
-        except Exception:
-            obj = None
-        if not isinstance(obj, dict):
-            continue
-        name = _pick_name(obj)
-        # Fallbacks: prefer human label sources when typical fields are absent
-        if not isinstance(name, str) or not name or name == "(unknown)":
-            kw = obj.get("_search_keyword") or obj.get("_keyword")
-            if isinstance(kw, str) and kw.strip():
-                name = kw.strip()
-            else:
-                st = obj.get("_seed_profile_title")
-                if isinstance(st, str) and st.strip():
-                    name = st.strip()
-                else:
-                    try:
-                        seed_url = obj.get("_seed_url")
-                        if isinstance(seed_url, str) and ("?" in seed_url):
-                            from urllib.parse import urlparse as _uparse, parse_qs as _pq, unquote as _unq
-                            q = _pq(_uparse(seed_url).query)
-                            val = None
-                            for kk in ("keyword", "q"):
-                                arr = q.get(kk) or []
-                                if arr:
-                                    val = arr[0]; break
-                            if isinstance(val, str) and val:
-                                name = _unq(val).strip() or name
-                    except Exception:
-                        pass
-
-                    if __name__ == "__main__":  # pragma: no cover
-                        main()
-        if not isinstance(name, str) or not name:
-            continue
-        cid = str(row.get("cid"))
-        ids.append(cid)
-        # Build embedding text: name + optional aliases/context
-        txt_parts: list[str] = [name]
-        if getattr(args, "include_aliases", False):
-            aliases = alias_map.get(cid)
-            if aliases:
-                # avoid duplicating main name
-                for a in aliases:
-                    if a and a != name:
-                        txt_parts.append(a)
-        if getattr(args, "include_context", False):
-            # include keyword and seed title if present
-            for k in ("_search_keyword", "_keyword", "_seed_profile_title"):
-                v = obj.get(k)
-                if isinstance(v, str) and v.strip() and v not in txt_parts:
-                    txt_parts.append(v.strip())
-        texts.append(" | ".join(txt_parts))
+    for cid, txt in zip(row_ids, built):
+        if txt is not None:
+            ids.append(cid)
+            texts.append(txt)
     if not ids:
         print("No rows to embed.")
-        return
-    vecs = embed_texts(texts)
+        return joined
+    # Embed in bounded micro-batches with progress; vectors are upserted once at the
+    # end because every upsert_vectors call rewrites the whole vectors parquet
+    step = max(int(getattr(args, "batch_size", 256) or 1), 1)
+    vecs: list = []
+    for i in range(0, len(texts), step):
+        vecs.extend(embed_texts(texts[i : i + step], batch_size=step))
+        if len(texts) > step:
+            print(f"Embedded {len(vecs)}/{len(texts)}")
     store.upsert_vectors(zip(ids, vecs))
     print(f"Embedded {len(ids)} rows.")
+    fresh = dict(zip(ids, vecs))
+    joined["vector"] = [fresh.get(c, v) for c, v in zip(joined["cid"].astype(str), joined["vector"])]
+    return joined
+
+
+def _auto_embed_and_index(args, store: Optional[PdbStorage] = None) -> None:
+    """Shared --auto-embed/--auto-index tail of the ingest commands.
+
+    The index is built from the frame cmd_embed returns, so the joined parquet is
+    read once rather than once per step.
+    """
+    df = None
+    if args.auto_embed or args.auto_index:
+        try:
+            df = cmd_embed(None, store=store)
+        except Exception as e:
+            print(f"Auto-embed failed: {e}")
+    if args.auto_index:
+        try:
+            from pathlib import Path as _Path
+            if df is None:
+                df = (store or _store()).load_joined()
+            # Mask the two needed columns rather than dropna-copying the whole frame
+            mask = df["vector"].notna().to_numpy()
+            vecs = df["vector"].to_numpy()[mask]
+            if not len(vecs):
+                print("No vectors found; run embed first.")
+            else:
+                outp = _Path(args.index_out)
+                _write_cosine_index(vecs, [str(c) for c in df["cid"].to_numpy()[mask]], outp, getattr(args, "index_type", "auto"))
+                print(f"Indexed {len(vecs)} vectors to {outp}")
+        except Exception as e:
+            print(f"Auto-index failed: {e}")
 
 
 async def cmd_dump(
@@ -165,20 +609,20 @@ async def cmd_dump(
     max_records: Optional[int],
     start_offset: int,
     client: PdbClient,
+    batch_size: int = 2000,
+    max_bytes: int = 64 * 1024 * 1024,
+    max_secs: float = 5.0,
 ) -> None:
-    store = PdbStorage()
-    batch: list[dict] = []
+    store = _store()
+    # Seal on count, payload bytes or age, whichever comes first
+    flusher = _Flusher(store, batch_size, max_bytes=max_bytes, max_secs=max_secs)
     count = 0
     async for item in client.iter_profiles(cid=cid, pid=pid, start_offset=start_offset):
-        batch.append(item)
-        if len(batch) >= 100:
-            store.upsert_raw(batch)
-            batch.clear()
+        await flusher.add([item])
         count += 1
         if max_records and count >= max_records:
             break
-    if batch:
-        store.upsert_raw(batch)
+    await flusher.flush()
     print(f"Dumped {count} profiles for cid={cid} pid={pid}")
 
 
@@ -199,6 +643,7 @@ def main():
     parser.add_argument("--base-url", type=str, default=None, help="API base URL (overrides PDB_API_BASE_URL)")
     parser.add_argument("--headers", type=str, default=None, help='Extra headers as JSON (merged last). Tip: pass @path or a JSON filepath to read from file.')
     parser.add_argument("--headers-file", type=str, default=None, help="Path to JSON file with extra headers (merged last)")
+    parser.add_argument("--http2", action=argparse.BooleanOptionalAction, default=None, help="Use HTTP/2 when the 'h2' package is installed (overrides PDB_HTTP2; default on)")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     def _make_client(args) -> PdbClient:
@@ -209,6 +654,8 @@ def main():
             kwargs["concurrency"] = args.concurrency
         if getattr(args, "timeout", None) is not None:
             kwargs["timeout_s"] = args.timeout
+        if getattr(args, "http2", None) is not None:
+            kwargs["http2"] = args.http2
         if getattr(args, "base_url", None):
             kwargs["base_url"] = args.base_url
         else:
@@ -233,7 +680,6 @@ def main():
         # Merge headers from --headers-file or --headers. Support @path or direct path in --headers.
         headers_obj = None
         try:
-            import json as _json
             import os as _os
             # Prefer explicit --headers-file when provided
             hdr_path = getattr(args, "headers_file", None)
@@ -244,24 +690,26 @@ def main():
                 if (s.startswith("@") and _os.path.exists(s[1:])) or _os.path.exists(s):
                     hdr_path = s[1:] if s.startswith("@") else s
             if hdr_path:
-                with open(hdr_path, "r", encoding="utf-8") as f:
-                    headers_obj = _json.loads(f.read())
+                with open(hdr_path, "rb") as f:
+                    headers_obj = orjson.loads(f.read())
             elif isinstance(raw_hdrs, str) and raw_hdrs:
-                headers_obj = _json.loads(raw_hdrs)
+                headers_obj = orjson.loads(raw_hdrs)
             else:
                 # Convenience: if a default headers file exists, use it
                 try:
                     default_hdr = _os.path.join("data", "bot_store", "headers.json")
                     if _os.path.exists(default_hdr):
-                        with open(default_hdr, "r", encoding="utf-8") as f:
-                            headers_obj = _json.loads(f.read())
+                        with open(default_hdr, "rb") as f:
+                            headers_obj = orjson.loads(f.read())
                 except Exception:
                     headers_obj = None
         except Exception:
             headers_obj = None
         if headers_obj is not None:
             kwargs["headers"] = headers_obj
-        return PdbClient(**kwargs)
+        # Handlers that call into each other (e.g. search-keywords' HTML fallback) get the
+        # same client, and with it the same keep-alive pool, for identical settings
+        return _shared_client(**kwargs)
 
     p_dump = sub.add_parser("dump", help="Dump profiles to parquet")
     p_dump.add_argument("--cid", type=int, required=True, help="category id (cid)")
@@ -274,10 +722,15 @@ def main():
     p_embed.add_argument("--chars-only", action="store_true", help="Only embed rows present in characters export")
     p_embed.add_argument("--include-aliases", action="store_true", help="When available, include character aliases (alt_names) to enrich embedding text")
     p_embed.add_argument("--include-context", action="store_true", help="Include keyword/seed-title hints in embedding text for better recall")
+    p_embed.add_argument("--batch-size", type=int, default=256, help="Texts per embedding micro-batch")
 
     p_dump_any = sub.add_parser("dump-any", help="Dump profiles without cid/pid filters")
     p_dump_any.add_argument("--max", type=int, default=None, help="optional max records")
     p_dump_any.add_argument("--start-offset", type=int, default=0, help="start offset for pagination")
+    for _p in (p_dump, p_dump_any):
+        _p.add_argument("--batch-size", type=int, default=2000, help="Upsert after this many profiles")
+        _p.add_argument("--batch-mb", type=int, default=64, help="...or once buffered payloads reach this many MiB (0 = no limit)")
+        _p.add_argument("--batch-secs", type=float, default=5.0, help="...or once the oldest buffered profile is this many seconds old (0 = no limit)")
 
     p_search = sub.add_parser("search", help="Search vectors and show top matches")
     p_search.add_argument("query", type=str) 
@@ -360,7 +813,7 @@ def main():
     # Scrape missing v1 profiles for any seen ids in raw parquet
     p_svm = sub.add_parser("scrape-v1-missing", help="Fetch v1 profiles for seen IDs that lack v1_profile entries")
     p_svm.add_argument("--v1-base-url", type=str, default="https://api.personality-database.com/api/v1", help="Base URL for v1 profile fetches")
-    p_svm.add_argument("--v1-headers", type=str, default=None, help="Headers JSON for v1 requests (merged last)")
+    p_svm.add_argument("--v1-headers", type=json.loads, default=None, help="Headers JSON for v1 requests (merged last)")
     p_svm.add_argument("--max", type=int, default=0, help="Max number of profiles to fetch (0 = all)")
     p_svm.add_argument("--shuffle", action="store_true", help="Shuffle fetch order")
     p_svm.add_argument("--auto-embed", action="store_true", help="Run embedding after scraping")
@@ -368,8 +821,10 @@ def main():
     p_svm.add_argument("--index-out", type=str, default="data/bot_store/pdb_faiss.index", help="Index output path for --auto-index")
     p_svm.add_argument("--fallback-v2", action="store_true", help="On v1 error (e.g., 401), attempt v2 profiles/{id} and upsert as v2_profile")
     p_svm.add_argument("--v2-base-url", type=str, default="https://api.personality-database.com/api/v2", help="Base URL for v2 fallback fetches")
-    p_svm.add_argument("--v2-headers", type=str, default=None, help="Headers JSON for v2 fallback requests (merged last)")
+    p_svm.add_argument("--v2-headers", type=json.loads, default=None, help="Headers JSON for v2 fallback requests (merged last)")
     p_svm.add_argument("--dry-run", action="store_true", help="Preview without upserts/embedding/indexing")
+    p_svm.add_argument("--v1-concurrency", type=int, default=128, help="Profile fetches scheduled concurrently per window")
+    p_svm.add_argument("--upsert-batch", type=int, default=1000, help="Buffer this many profiles per raw parquet upsert")
 
     p_disc = sub.add_parser("discover", help="Discover frequent values of fields to guide filters")
     p_disc.add_argument("path", type=str, help="API path, e.g., profiles")
@@ -409,6 +864,7 @@ def main():
     p_fh.add_argument("--boards-max", type=int, default=5, help="Max boards per page to expand when --expand-boards")
     p_fh.add_argument("--chase-hints", action="store_true", help="If payload contains hint terms, run search/top on them and merge results")
     p_fh.add_argument("--hints-max", type=int, default=5, help="Max hint terms to chase when --chase-hints")
+    p_fh.add_argument("--upsert-batch", type=int, default=2000, help="Buffer this many items per raw parquet upsert")
     p_fh.add_argument("--dry-run", action="store_true", help="Preview results without writing/upserting or embedding/indexing")
 
     p_st = sub.add_parser("search-top", help="Call v2 search/top and upsert list results")
@@ -440,6 +896,7 @@ def main():
     p_st.add_argument("--chase-hints", action="store_true", help="If payload contains hint terms, run search/top on them and merge results")
     p_st.add_argument("--hints-max", type=int, default=5, help="Max hint terms to chase when --chase-hints")
     p_st.add_argument("--dry-run", action="store_true", help="Preview results without writing/upserting or embedding/indexing")
+    p_st.add_argument("--upsert-batch", type=int, default=10000, help="Buffer this many items per raw parquet upsert")
 
     # Bulk keyword search: expand over many queries and ingest results
     p_sb = sub.add_parser(
@@ -465,6 +922,12 @@ def main():
     p_sb.add_argument("--pages", type=int, default=1, help="Pages to fetch per query (unless --until-empty)")
     p_sb.add_argument("--until-empty", action="store_true", help="Keep paging per query until empty page")
     p_sb.add_argument("--next-cursor", type=int, default=0, help="Starting nextCursor value for paging")
+    p_sb.add_argument(
+        "--query-concurrency",
+        type=int,
+        default=4,
+        help="Number of queries paged concurrently (HTTP is still bounded by --concurrency/--rpm)",
+    )
     p_sb.add_argument(
         "--max-no-progress-pages",
         type=int,
@@ -563,6 +1026,7 @@ def main():
         default=None,
         help="Optional limit to pass to expand-from-url when parsing search URLs (defaults to --limit)",
     )
+    p_sb.add_argument("--upsert-batch", type=int, default=10000, help="Buffer this many items per raw parquet upsert")
 
     p_dc = sub.add_parser("discover-cidpid", help="Probe cid/pid or cat_id/property_id pairs for non-empty results")
     p_dc.add_argument("--path", type=str, default="profiles", help="API path to probe (default: profiles)")
@@ -632,6 +1096,13 @@ def main():
         action="store_true",
         help="Treat each seed ID as a character-group source for relaxed filtering",
     )
+    p_xrel.add_argument(
+        "--related-concurrency",
+        type=int,
+        default=16,
+        help="Max seed IDs whose related/meta lookups are in flight at once",
+    )
+    p_xrel.add_argument("--upsert-batch", type=int, default=2000, help="Buffer this many items per raw parquet upsert")
     p_xrel.add_argument("--dry-run", action="store_true", help="Preview without writing/upserting")
     p_xrel.add_argument(
         "--set-keyword",
@@ -670,6 +1141,7 @@ def main():
         action="store_true",
         help="Treat discovered sub_cat_id groups as character-group sources for relaxed filtering",
     )
+    p_xurl.add_argument("--upsert-batch", type=int, default=2000, help="Buffer this many items per raw parquet upsert")
     p_xurl.add_argument("--dry-run", action="store_true", help="Preview without writing/upserting")
     p_xurl.add_argument(
         "--set-keyword",
@@ -879,7 +1351,7 @@ def main():
     p_scan.add_argument("--max-seeds", type=int, default=100, help="Max number of seeds to process when inferred")
     p_scan.add_argument("--depth", type=int, default=1, help="Traversal depth for related expansion (currently supports 1)")
     p_scan.add_argument("--v1-base-url", type=str, default="https://api.personality-database.com/api/v1", help="Base URL for v1 profile fetches")
-    p_scan.add_argument("--v1-headers", type=str, default=None, help="Headers JSON for v1 requests (merged last)")
+    p_scan.add_argument("--v1-headers", type=json.loads, default=None, help="Headers JSON for v1 requests (merged last)")
     p_scan.add_argument("--search-names", action="store_true", help="For each related item, call v2 search/top using its name")
     p_scan.add_argument("--limit", type=int, default=20, help="Limit per search-top page when --search-names is set")
     p_scan.add_argument("--pages", type=int, default=1, help="Pages per name for search-top when --search-names")
@@ -955,7 +1427,7 @@ def main():
     p_all.add_argument("--index-out", type=str, default="data/bot_store/pdb_faiss.index", help="Index output path for --auto-index")
     p_all.add_argument("--scrape-v1", action="store_true", help="Fetch v1 profile/{id} for newly discovered profile IDs")
     p_all.add_argument("--v1-base-url", type=str, default="https://api.personality-database.com/api/v1", help="Base URL for v1 profile fetches")
-    p_all.add_argument("--v1-headers", type=str, default=None, help="Headers JSON for v1 requests (merged last)")
+    p_all.add_argument("--v1-headers", type=json.loads, default=None, help="Headers JSON for v1 requests (merged last)")
 
     # Maintenance: retroactively tag rows with a keyword for alias enrichment
     p_tag = sub.add_parser(
@@ -1025,8 +1497,7 @@ def main():
         # Build meta client reusing headers/limits
         meta_client = None
         try:
-            from .pdb_client import PdbClient as _PdbClient
-            meta_client = _PdbClient(
+            meta_client = _shared_client(
                 base_url="https://meta.personality-database.com/api/v2",
                 concurrency=getattr(base_client, "concurrency", 4),
                 rate_per_minute=getattr(base_client, "rate_per_minute", 60),
@@ -1175,24 +1646,18 @@ def main():
                                     alt_list = payload2.get(alt_key) or []
                                     if alt_list:
                                         if alt_key in ("characters", "relatedProfiles"):
-                                            alt_list = [({**it, "_from_character_group": True} if isinstance(it, dict) else it) for it in alt_list]
+                                            for it in alt_list:
+                                                if isinstance(it, dict):
+                                                    it["_from_character_group"] = True
                                         profs = (profs or []) + alt_list
                                 for it in profs or []:
                                     if isinstance(it, dict):
-                                        pid = None
-                                        for kk in ("id","profileId","profile_id","profileID"):
-                                            vv = it.get(kk)
-                                            if isinstance(vv, int): pid = vv; break
-                                            if isinstance(vv, str) and vv.isdigit(): pid = int(vv); break
+                                        pid = _get_pid(it)
                                         if isinstance(pid, int):
                                             expanded_pairs.append((f"https://www.personality-database.com/profile/{pid}", kw))
                                 for sc in (payload2.get("subcategories") or []):
                                     if isinstance(sc, dict):
-                                        sid = None
-                                        for kk in ("id","profileId","profile_id","profileID"):
-                                            vv = sc.get(kk)
-                                            if isinstance(vv, int): sid = vv; break
-                                            if isinstance(vv, str) and vv.isdigit(): sid = int(vv); break
+                                        sid = _get_pid(sc)
                                         if isinstance(sid, int):
                                             expanded_pairs.append((f"https://www.personality-database.com/profile?sub_cat_id={sid}", kw))
                         except Exception:
@@ -1249,8 +1714,8 @@ def main():
             target_lists = {"profiles"}
         elif isinstance(getattr(args_expand, "lists", None), str) and args_expand.lists:
             target_lists = {s.strip() for s in args_expand.lists.split(",") if s.strip()}
-        store = PdbStorage()
-        total = 0
+        store = _store()
+        flusher = _Flusher(store, getattr(args_expand, "upsert_batch", 2000))
         forced_kw = getattr(args_expand, "set_keyword", None)
         for u, search_kw in url_list:
             pid = _extract_pid(u)
@@ -1267,7 +1732,10 @@ def main():
                         if isinstance(vv, str) and vv.strip():
                             seed_title = vv.strip()
                             break
-                    main_obj = {**pobj, "_source": "v2_profile", "_profile_id": pid, "_seed_url": u}
+                    main_obj = pobj
+                    main_obj["_source"] = "v2_profile"
+                    main_obj["_profile_id"] = pid
+                    main_obj["_seed_url"] = u
                     kw_to_use = (forced_kw or search_kw)
                     if isinstance(kw_to_use, str) and kw_to_use:
                         main_obj["_search_keyword"] = kw_to_use
@@ -1281,13 +1749,11 @@ def main():
                         if not is_char0 and getattr(args_expand, "characters_relaxed", False):
                             is_char0 = main_obj.get("_from_character_group") is True
                         if is_char0:
-                            n0, u0 = store.upsert_raw([main_obj])
-                            total += (n0 + u0)
-                            print(f"url={u} pid={pid}: upserted profile new={n0} updated={u0}")
+                            await flusher.add([main_obj])
+                            print(f"url={u} pid={pid}: queued profile")
                     else:
-                        n0, u0 = store.upsert_raw([main_obj])
-                        total += (n0 + u0)
-                        print(f"url={u} pid={pid}: upserted profile new={n0} updated={u0}")
+                        await flusher.add([main_obj])
+                        print(f"url={u} pid={pid}: queued profile")
             # sub_cat_id extraction from URL query
             sub_ids: list[int] = []
             try:
@@ -1327,7 +1793,9 @@ def main():
             if not sub_ids:
                 print(f"url={u}: no sub_cat_id found (query or meta); skipping")
                 continue
-            for sid in sub_ids:
+            # Fetch every subcategory's related list (with its meta fallback) concurrently,
+            # then annotate and upsert them in order
+            async def _sub_lists(sid: int) -> dict[str, list]:
                 lists: dict[str, list] = {}
                 try:
                     data = await base_client.fetch_json(f"profiles/{sid}/related")
@@ -1357,7 +1825,9 @@ def main():
                             v = mpayload.get(k)
                             if isinstance(v, list) and v:
                                 if k in ("characters", "relatedProfiles"):
-                                    v = [({**it, "_from_character_group": True} if isinstance(it, dict) else it) for it in v]
+                                    for it in v:
+                                        if isinstance(it, dict):
+                                            it["_from_character_group"] = True
                                 merged.extend(v)
                         if not merged:
                             prof_like: list[dict] = []
@@ -1368,13 +1838,7 @@ def main():
                                             isinstance(x.get(k), str) and x.get(k)
                                             for k in ("name","title","subcategory","display_name","username")
                                         )
-                                        id_val = None
-                                        for kk in ("id","profileId","profile_id","profileID"):
-                                            vv = x.get(kk)
-                                            if isinstance(vv, int):
-                                                id_val = vv; break
-                                            if isinstance(vv, str) and vv.isdigit():
-                                                id_val = int(vv); break
+                                        id_val = _get_pid(x)
                                         if (has_name and id_val is not None) or (x.get("isCharacter") is True):
                                             prof_like.append(x)
                                         for v in x.values():
@@ -1389,13 +1853,21 @@ def main():
                                 merged.extend(prof_like)
                         if merged:
                             lists["profiles"] = merged
-                selected = set(lists.keys()) if target_lists is None else (set(lists.keys()) & set(target_lists))
+                return lists
+
+            for sid, lists in zip(sub_ids, await asyncio.gather(*(_sub_lists(s) for s in sub_ids))):
+                selected = set(lists) if target_lists is None else (lists.keys() & target_lists)
                 batch: list[dict] = []
+                emitted: set[int] = set()
                 for key in sorted(selected):
                     for it in lists.get(key, []) or []:
                         if not isinstance(it, dict):
                             continue
-                        obj = {**it, "_source": f"v2_related_from_url:{key}", "_seed_url": u, "_seed_pid": pid, "_seed_sub_cat_id": sid}
+                        obj = _for_annotation(it, emitted)
+                        obj["_source"] = f"v2_related_from_url:{key}"
+                        obj["_seed_url"] = u
+                        obj["_seed_pid"] = pid
+                        obj["_seed_sub_cat_id"] = sid
                         kw_to_use = (forced_kw or search_kw)
                         if isinstance(kw_to_use, str) and kw_to_use:
                             obj["_search_keyword"] = kw_to_use
@@ -1416,10 +1888,10 @@ def main():
                 if not batch:
                     print(f"url={u} sid={sid}: no items after filtering.")
                     continue
-                n, u2 = store.upsert_raw(batch)
-                total += (n + u2)
-                print(f"url={u} sid={sid}: upserted new={n} updated={u2}")
-        print(f"Done. Upserted total rows: {total}")
+                await flusher.add(batch)
+                print(f"url={u} sid={sid}: queued {len(batch)} items")
+        await flusher.flush()
+        print(f"Done. Upserted total rows: {flusher.new + flusher.updated} (new={flusher.new} updated={flusher.updated})")
         # Restore stdout and close log if used
         try:
             _sys.stdout = orig_stdout
@@ -1428,39 +1900,48 @@ def main():
         except Exception:
             pass
 
+    for _p in (p_idx, p_xci, p_svm, p_fh, p_st, p_sb):
+        _p.add_argument(
+            "--index-type",
+            choices=INDEX_TYPES,
+            default="auto",
+            help="FAISS index kind: flat (exact), hnsw, ivf, ivfpq (compressed), sq8 (int8 rows), sqfp16 (float16 rows), or auto (flat, hnsw from 50k vectors, ivfpq from 1M)",
+        )
+    for _p in (p_sfaiss, p_sfp, p_schar):
+        _p.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query (ivf/ivfpq indexes; higher = better recall)")
+        _p.add_argument("--gpu", action="store_true", help="Search on GPU 0 when a GPU build of FAISS is installed (flat/ivf/ivfpq indexes)")
     args = parser.parse_args()
 
     if args.cmd == "dump":
         try:
             client = _make_client(args)
-            asyncio.run(cmd_dump(cid=args.cid, pid=args.pid, max_records=args.max, start_offset=args.start_offset, client=client))
+            _run_async(cmd_dump(
+                cid=args.cid, pid=args.pid, max_records=args.max, start_offset=args.start_offset, client=client,
+                batch_size=args.batch_size, max_bytes=args.batch_mb * 1024 * 1024, max_secs=args.batch_secs,
+            ))
         except Exception as e:
             print(f"Dump failed: {e}\nHint: If the API requires auth, set PDB_API_TOKEN or PDB_API_HEADERS.")
     elif args.cmd == "dump-any":
         async def _run():
             client = _make_client(args)
-            store = PdbStorage()
+            store = _store()
             try:
                 from .pdb_edges import PdbEdgesStorage as _PdbEdges
                 edges_store = _PdbEdges()
             except Exception:
                 edges_store = None
             # no edges recorded for dump-any
-            batch: list[dict] = []
+            flusher = _Flusher(store, args.batch_size, max_bytes=args.batch_mb * 1024 * 1024, max_secs=args.batch_secs)
             count = 0
             async for item in client.iter_profiles_any(start_offset=args.start_offset):
-                batch.append(item)
-                if len(batch) >= 100:
-                    store.upsert_raw(batch)
-                    batch.clear()
+                await flusher.add([item])
                 count += 1
                 if args.max and count >= args.max:
                     break
-            if batch:
-                store.upsert_raw(batch)
+            await flusher.flush()
             print(f"Dumped {count} profiles (unfiltered)")
         try:
-            asyncio.run(_run())
+            _run_async(_run())
         except Exception as e:
             print(f"Dump-any failed: {e}\nHint: If the API requires auth, set PDB_API_TOKEN or PDB_API_HEADERS.")
     elif args.cmd == "embed":
@@ -1476,40 +1957,29 @@ def main():
     elif args.cmd == "index":
         try:
             import faiss  # type: ignore
-            import numpy as _np
             from pathlib import Path as _Path
-            store = PdbStorage()
-            df = store.load_joined()
-            rows = df.dropna(subset=["vector"]).reset_index(drop=True)
-            if rows.empty:
+            store = _store()
+            # Only cids and vectors are needed: skip the payload join entirely
+            cids, mat = store.load_vector_matrix()
+            if not cids:
                 print("No vectors found; run embed first.")
                 return
-            mat = _np.vstack(rows["vector"].to_list()).astype("float32")
-            # normalize for cosine similarity via inner product
-            norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-            mat = mat / norms
-            index = faiss.IndexFlatIP(mat.shape[1])
-            index.add(mat)
+            # cosine similarity via inner product over normalized vectors; cid map alongside
             outp = _Path(args.out)
-            outp.parent.mkdir(parents=True, exist_ok=True)
-            faiss.write_index(index, str(outp))
-            # write cid map alongside
-            (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(rows["cid"].astype(str).tolist()), encoding="utf-8")
-            print(f"Indexed {len(rows)} vectors to {outp}")
+            _write_cosine_index(mat, cids, outp, getattr(args, "index_type", "auto"))
+            print(f"Indexed {len(cids)} vectors to {outp}")
         except Exception as e:
             print(f"Indexing failed: {e}")
     elif args.cmd == "search-faiss":
-        import numpy as np
         from pathlib import Path
         import faiss  # type: ignore
         # load index and cids
         idxp = Path(args.index)
-        map_path = idxp.with_suffix(idxp.suffix + ".cids")
-        if not idxp.exists() or not map_path.exists():
-            print(f"Missing index or cid map at {idxp} and {map_path}. Run 'pdb-cli index' first.")
+        cids = _read_cid_map(idxp)
+        if not idxp.exists() or cids is None:
+            print(f"Missing index or cid map at {idxp} (.cids.arrow). Run 'pdb-cli index' first.")
             return
         index = faiss.read_index(str(idxp))
-        cids = map_path.read_text(encoding="utf-8").splitlines()
         # embed query and normalize
         q_list = embed_texts([args.query])[0]
         qv = np.array(q_list, dtype="float32")[None, :]
@@ -1522,7 +1992,7 @@ def main():
                 h = int(_hashlib.sha256(tok.lower().encode()).hexdigest(), 16)
                 buckets[h % index.d] += 1.0
             qv = np.array([buckets], dtype="float32")
-        qv = qv / (np.linalg.norm(qv, axis=1, keepdims=True) + 1e-12)
+        faiss.normalize_L2(qv)
         # If filters are provided, search a larger candidate set to improve chances of matches
         desired_top = int(getattr(args, "top", 10) or 10)
         has_filters = bool(getattr(args, "contains", None) or getattr(args, "regex", None))
@@ -1530,24 +2000,24 @@ def main():
         if has_filters:
             # Search up to 1000 or 50x requested, bounded by index size
             search_k = min(len(cids), max(desired_top * 50, 1000))
+        _tune_for_k(index, search_k, getattr(args, "nprobe", None))
+        index = _maybe_to_gpu(index, bool(getattr(args, "gpu", False)))
         scores, I = index.search(qv, search_k)
         for rank, (i, s) in enumerate(zip(I[0], scores[0]), start=1):
             if i < 0 or i >= len(cids):
                 continue
             print(f"{rank}. cid={cids[int(i)][:12]} score={float(s):.4f}")
     elif args.cmd in {"search-faiss-pretty", "search-characters"}:
-        import numpy as np
         from pathlib import Path
         import faiss  # type: ignore
         import re as _re
         # load index and cid map
         idxp = Path(args.index)
-        map_path = idxp.with_suffix(idxp.suffix + ".cids")
-        if not idxp.exists() or not map_path.exists():
-            print(f"Missing index or cid map at {idxp} and {map_path}. Run the corresponding index command first.")
+        cids = _read_cid_map(idxp)
+        if not idxp.exists() or cids is None:
+            print(f"Missing index or cid map at {idxp} (.cids.arrow). Run the corresponding index command first.")
             return
         index = faiss.read_index(str(idxp))
-        cids = map_path.read_text(encoding="utf-8").splitlines()
         # Optional names file aligned with cids
         names_path = idxp.with_suffix(idxp.suffix + ".names")
         # embed and normalize query
@@ -1561,7 +2031,7 @@ def main():
                 h = int(_hashlib.sha256(tok.lower().encode()).hexdigest(), 16)
                 buckets[h % index.d] += 1.0
             qv = np.array([buckets], dtype="float32")
-        qv = qv / (np.linalg.norm(qv, axis=1, keepdims=True) + 1e-12)
+        faiss.normalize_L2(qv)
         desired_top = int(getattr(args, "top", 10) or 10)
         # If filters are provided, search a larger candidate set
         contains = (getattr(args, "contains", None) or "").strip().lower()
@@ -1575,6 +2045,8 @@ def main():
         search_k = desired_top
         if has_filters:
             search_k = min(len(cids), max(desired_top * 50, 1000))
+        _tune_for_k(index, search_k, getattr(args, "nprobe", None))
+        index = _maybe_to_gpu(index, bool(getattr(args, "gpu", False)))
         scores, I = index.search(qv, search_k)
         # Map cids to names using names file when available; fallback to joined store
         cid_to_name: dict[str, str] = {}
@@ -1583,24 +2055,11 @@ def main():
             for cid, nm in zip(cids, names):
                 cid_to_name[cid] = nm or "(unknown)"
         else:
-            store = PdbStorage()
-            df = store.load_joined()
-            for _, row in df.iterrows():
-                cid = str(row.get("cid"))
-                if not cid:
-                    continue
-                pb = row.get("payload_bytes")
-                try:
-                    obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-                except Exception:
-                    obj = None
-                name = None
-                if isinstance(obj, dict):
-                    for k in ("name", "title", "display_name", "username", "subcategory"):
-                        v = obj.get(k)
-                        if isinstance(v, str) and v:
-                            name = v; break
-                cid_to_name[cid] = name or "(unknown)"
+            # Names come pre-decoded (same key order) from the decoded sidecar
+            tbl = _store().load_decoded(["cid", "name"])
+            for cid, name in zip(tbl.column("cid").to_pylist(), tbl.column("name").to_pylist()):
+                if cid:
+                    cid_to_name[cid] = name or "(unknown)"
         # Load names/alt_names from characters parquet when available so filters can match aliases and fill unknowns
         cid_altnames: dict[str, list[str]] = {}
         cid_charnames: dict[str, str] = {}
@@ -1610,12 +2069,10 @@ def main():
             if char_path.exists():
                 cdf = __import__("pandas").read_parquet(char_path)
                 if "cid" in cdf.columns and "alt_names" in cdf.columns:
-                    for _, r in cdf.iterrows():
-                        scid = str(r.get("cid"))
-                        alt = r.get("alt_names")
+                    for rcid, nmv, alt in cdf.reindex(columns=["cid", "name", "alt_names"]).itertuples(index=False, name=None):
+                        scid = str(rcid)
                         if isinstance(alt, str) and alt:
                             cid_altnames[scid] = [p.strip() for p in alt.split(" | ") if p.strip()]
-                        nmv = r.get("name")
                         if isinstance(nmv, str) and nmv:
                             cid_charnames[scid] = nmv
         except Exception:
@@ -1695,37 +2152,26 @@ def main():
         import pandas as pd
         import re as _re
         from pathlib import Path as _Path
-        store = PdbStorage()
+        store = _store()
         # Choose source parquet
         src_path = _Path("data/bot_store/pdb_characters.parquet") if args.chars_only else store.raw_path
         if not src_path.exists():
             print(f"Missing source parquet: {src_path}")
             return
-        df = pd.read_parquet(src_path)
         # Ensure we have names: for raw, parse payloads
         names: list[tuple[str, str]] = []  # (cid, name)
         if not args.chars_only:
-            for _, row in df.iterrows():
-                cid = str(row.get("cid"))
-                pb = row.get("payload_bytes")
-                try:
-                    obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else None
-                except Exception:
-                    obj = None
-                nm = None
-                if isinstance(obj, dict):
-                    for k in ("name","title","display_name","username","subcategory"):
-                        v = obj.get(k)
-                        if isinstance(v, str) and v:
-                            nm = v; break
+            # Names come from the decoded sidecar, so no payload JSON is parsed here
+            tbl = store.load_decoded(["cid", "name"])
+            tbl = _filter_names_containing(tbl, (args.contains or "").strip())
+            for cid, nm in zip(tbl.column("cid").to_pylist(), tbl.column("name").to_pylist()):
                 if nm:
-                    names.append((cid, nm))
+                    names.append((str(cid), nm))
         else:
+            df = pd.read_parquet(src_path)
             # characters parquet may have name and alt_names
-            for _, row in df.iterrows():
-                cid = str(row.get("cid"))
-                nm = row.get("name")
-                alt = row.get("alt_names")
+            for rcid, nm, alt in df.reindex(columns=["cid", "name", "alt_names"]).itertuples(index=False, name=None):
+                cid = str(rcid)
                 if isinstance(nm, str) and nm:
                     names.append((cid, nm))
                 if isinstance(alt, str) and alt:
@@ -1765,12 +2211,11 @@ def main():
     elif args.cmd == "ids-by-name":
         import pandas as pd
         import re as _re
-        store = PdbStorage()
+        store = _store()
         raw_path = store.raw_path
         if not raw_path.exists():
             print(f"Missing raw parquet: {raw_path}")
             return
-        df = pd.read_parquet(raw_path)
         contains = (args.contains or "").strip().lower()
         pattern = None
         if args.regex:
@@ -1779,21 +2224,11 @@ def main():
             except Exception as e:
                 print(f"Invalid regex: {e}")
                 return
+        # Name and id come pre-decoded from the sidecar; narrow by name in one Arrow pass.
+        # api_pid, not pid: only API id keys and digit-only strings count here
+        tbl = _filter_names_containing(store.load_decoded(["api_pid", "name"]), contains)
         count = 0
-        for _, row in df.iterrows():
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else None
-            except Exception:
-                obj = None
-            if not isinstance(obj, dict):
-                continue
-            nm = None
-            for k in ("name","title","display_name","username","subcategory"):
-                v = obj.get(k)
-                if isinstance(v, str) and v:
-                    nm = v
-                    break
+        for pid, nm in zip(tbl.column("api_pid").to_pylist(), tbl.column("name").to_pylist()):
             if not nm:
                 continue
             low = nm.lower()
@@ -1801,15 +2236,6 @@ def main():
                 continue
             if pattern and not pattern.search(nm):
                 continue
-            pid = None
-            for k in ("id","profileId","profile_id","profileID"):
-                v = obj.get(k)
-                if isinstance(v, int):
-                    pid = v
-                    break
-                if isinstance(v, str) and v.isdigit():
-                    pid = int(v)
-                    break
             if pid is None:
                 continue
             print(f"name={nm} pid={pid}")
@@ -1844,24 +2270,13 @@ def main():
                 parts = [p.strip() for p in _re.split(r"[\s,]+", src) if p.strip()]
                 items.extend(parts)
             # de-duplicate while preserving order
-            seen = set()
-            out: list[str] = []
-            for it in items:
-                if it not in seen:
-                    seen.add(it)
-                    out.append(it)
+            out: list[str] = list(dict.fromkeys(items))
             return out
 
-        def _pick_name(obj: dict) -> str:
-            for k in ("name", "title", "display_name", "username", "subcategory"):
-                v = obj.get(k)
-                if isinstance(v, str) and v:
-                    return v
-            return "(unknown)"
 
         async def _run():
             client = _make_client(args)
-            store = PdbStorage()
+            store = _store()
             log_fp = None
             def _log(msg: str) -> None:
                 try:
@@ -1916,23 +2331,32 @@ def main():
             elif isinstance(args.lists, str) and args.lists:
                 target_lists = {s.strip() for s in args.lists.split(",") if s.strip()}
 
-            total_new = total_updated = 0
-            for q, is_expanded in queries:
+            # Pages from all queries share one buffered writer; progress is judged against
+            # the profile ids already stored or seen earlier in this run
+            flusher = _Flusher(store, getattr(args, "upsert_batch", 10000))
+            known = _known_cids(store) if not args.dry_run else set()
+
+            async def _one_query(q: str, is_expanded: bool) -> None:
                 cursor = int(getattr(args, "next_cursor", 0)) if hasattr(args, "next_cursor") else 0
                 no_prog = 0
                 pages = 0
                 found_any = 0
                 if args.verbose:
                     _log(f"[debug] search-keywords start keyword='{q}' limit={args.limit} only_profiles={args.only_profiles}")
-                while True:
-                    params = {"limit": args.limit}
+                # Determine page budget for this query
+                max_pages = args.expand_pages if (is_expanded and getattr(args, "expand_pages", None)) else args.pages
+
+                def _page_params(cur) -> dict:
                     # For v2 search/top the query param is typically 'keyword'
-                    params["keyword"] = q
-                    if cursor:
-                        params["nextCursor"] = cursor
-                    data = None
+                    params = {"limit": args.limit, "keyword": q}
+                    if cur:
+                        params["nextCursor"] = cur
+                    return params
+
+                next_task: Optional[asyncio.Task] = asyncio.create_task(client.fetch_json("search/top", _page_params(cursor)))
+                while True:
                     try:
-                        data = await client.fetch_json("search/top", params)
+                        data = await next_task
                     except Exception as e:
                         print(f"search/top failed for '{q}': {e}")
                         break
@@ -1951,6 +2375,10 @@ def main():
                                 break
                         except Exception:
                             pass
+                    # Prefetch the next page while this one is processed
+                    next_task = None
+                    if args.until_empty or pages + 1 < max_pages:
+                        next_task = asyncio.create_task(client.fetch_json("search/top", _page_params(next_cur)))
                     # Collect list items
                     lists: dict[str, list] = {}
                     if isinstance(payload, dict):
@@ -1972,56 +2400,33 @@ def main():
                                 alt = lists.get(alt_key) or []
                                 if alt:
                                     # Preserve provenance so relaxed character filtering can pass
-                                    marked = [
-                                        ({**it, "_from_character_group": True} if isinstance(it, dict) else it)
-                                        for it in alt
-                                    ]
+                                    # Tag copies so the items still listed under alt_key keep their own provenance
+                                    alt = [{**it, "_from_character_group": True} if isinstance(it, dict) else it for it in alt]
                                     base = lists.get("profiles") or []
-                                    lists["profiles"] = (base + marked)
+                                    lists["profiles"] = (base + alt)
                     if args.verbose:
                         key_counts = ", ".join(f"{k}:{len(lists.get(k, []) or [])}" for k in sorted(lists.keys()))
                         _log(f"[debug] page={pages+1} keys={{ {key_counts} }} nextCursor={next_cur}")
                     selected_keys = (
-                        set(lists.keys()) if target_lists is None else (set(lists.keys()) & set(target_lists))
+                        set(lists) if target_lists is None else (lists.keys() & target_lists)
                     )
                     # Expand subcategories when requested
                     expanded_profiles: list[dict] = []
                     if args.expand_subcategories and "subcategories" in lists:
                         subcats = lists.get("subcategories", [])[: max(int(args.expand_max), 0)]
+                        sids: list[int] = []
                         for sc in subcats:
-                            sid = None
-                            if isinstance(sc, dict):
-                                for key in ("id", "profileId", "profile_id", "profileID"):
-                                    v = sc.get(key)
-                                    if isinstance(v, int):
-                                        sid = v; break
-                                    if isinstance(v, str) and v.isdigit():
-                                        sid = int(v); break
-                            if not isinstance(sid, int):
-                                continue
-                            try:
-                                rel = await client.fetch_json(f"profiles/{sid}/related")
-                            except Exception:
-                                continue
-                            rel_payload = rel.get("data") if isinstance(rel, dict) else rel
-                            rel_list = []
-                            if isinstance(rel_payload, dict):
-                                rel_list = (
-                                    rel_payload.get("relatedProfiles")
-                                    or rel_payload.get("profiles")
-                                    or []
-                                )
-                            if not isinstance(rel_list, list):
-                                continue
+                            sid = _get_pid(sc) if isinstance(sc, dict) else None
+                            if isinstance(sid, int):
+                                sids.append(sid)
+                        annot = {"_source": "v2_related_from_subcategory", "_keyword": q}
+                        for rel_list in await _fetch_related_lists(client, sids):
                             for it in rel_list:
                                 if isinstance(it, dict):
-                                    ex = {
-                                        **it,
-                                        "_source": "v2_related_from_subcategory",
-                                        "_keyword": q,
-                                        "_from_character_group": True if args.force_character_group else it.get("_from_character_group") or False,
-                                    }
-                                    expanded_profiles.append(ex)
+                                    # Related payloads are fetched per subcategory and owned here; tag in place
+                                    it.update(annot)
+                                    it["_from_character_group"] = True if args.force_character_group else it.get("_from_character_group") or False
+                                    expanded_profiles.append(it)
 
                     # Optional: expand via boards and chase payload hints
                     async def _expand_by_term(term: str, tag: str) -> list[dict]:
@@ -2048,18 +2453,19 @@ def main():
                                 if alt_key in lists2:
                                     alt2 = lists2.get(alt_key) or []
                                     if alt2:
-                                        marked2 = [
-                                            ({**it, "_from_character_group": True} if isinstance(it, dict) else it)
-                                            for it in alt2
-                                        ]
+                                        # Tag copies so the items still listed under alt_key keep their own provenance
+                                        alt2 = [{**it, "_from_character_group": True} if isinstance(it, dict) else it for it in alt2]
                                         base2 = lists2.get("profiles") or []
-                                        lists2["profiles"] = (base2 + marked2)
+                                        lists2["profiles"] = (base2 + alt2)
                         out: list[dict] = []
+                        emitted: set[int] = set()
                         for ksel in sorted(selected_keys):
+                            annot2 = {"_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": q}
                             for it2 in lists2.get(ksel, []) or []:
                                 if not isinstance(it2, dict):
                                     continue
-                                obj2 = {**it2, "_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": q}
+                                obj2 = _for_annotation(it2, emitted)
+                                obj2.update(annot2)
                                 if args.filter_characters:
                                     is_char2 = obj2.get("isCharacter") is True
                                     if not is_char2 and args.characters_relaxed:
@@ -2071,6 +2477,7 @@ def main():
                     extra_items: list[dict] = []
                     if getattr(args, "expand_boards", False) and "boards" in lists:
                         boards = lists.get("boards", [])[: max(int(getattr(args, "boards_max", 0)), 0)]
+                        bnames: list[str] = []
                         for b in boards:
                             if not isinstance(b, dict):
                                 continue
@@ -2081,7 +2488,9 @@ def main():
                                     bname = v; break
                             if not bname:
                                 continue
-                            extra_items.extend(await _expand_by_term(bname, "board"))
+                            bnames.append(bname)
+                        for found in await asyncio.gather(*(_expand_by_term(bn, "board") for bn in bnames)):
+                            extra_items.extend(found)
                     if getattr(args, "chase_hints", False) and isinstance(payload, dict):
                         raw_hints = []
                         for hk in ("hint", "hints", "suggestions", "suggested", "suggestedKeywords", "suggested_terms"):
@@ -2099,29 +2508,23 @@ def main():
                                             nv = x.get(nk)
                                             if isinstance(nv, str):
                                                 raw_hints.append(nv); break
-                        seen_h = set()
-                        hints = []
-                        for h in raw_hints:
-                            if not isinstance(h, str):
-                                continue
-                            hh = h.strip()
-                            if not hh or hh == q or hh in seen_h:
-                                continue
-                            seen_h.add(hh)
-                            hints.append(hh)
+                        stripped = (h.strip() for h in raw_hints if isinstance(h, str))
+                        hints = list(dict.fromkeys(hh for hh in stripped if hh and hh != q))
                         hints = hints[: max(int(getattr(args, "hints_max", 0)), 0)]
-                        for h in hints:
-                            extra_items.extend(await _expand_by_term(h, "hint"))
+                        for found in await asyncio.gather(*(_expand_by_term(h, "hint") for h in hints)):
+                            extra_items.extend(found)
 
                     # Build batch with optional character filtering
                     batch: list[dict] = []
+                    emitted: set[int] = set()
                     for key in sorted(selected_keys):
                         items = lists.get(key, [])
-                        src_name = f"v2_search_top:{key}"
+                        annot = {"_source": f"v2_search_top:{key}", "_keyword": q}
                         for it in items:
                             if not isinstance(it, dict):
                                 continue
-                            obj = {**it, "_source": src_name, "_keyword": q}
+                            obj = _for_annotation(it, emitted)
+                            obj.update(annot)
                             # Filtering
                             if args.filter_characters:
                                 is_char = obj.get("isCharacter") is True
@@ -2149,11 +2552,10 @@ def main():
                         if names:
                             _log(f"  {names}")
 
-                    new = upd = 0
+                    new = 0
                     if not args.dry_run and batch:
-                        n, u = store.upsert_raw(batch)
-                        new += n; upd += u
-                        total_new += n; total_updated += u
+                        new = _count_new(batch, known)
+                        await flusher.add(batch)
                     # track that we surfaced some items for this keyword, even if they were duplicates
                     if batch:
                         found_any += len(batch)
@@ -2165,8 +2567,6 @@ def main():
                         no_prog = 0
                     pages += 1
                     # decide on next page
-                    # Determine page budget for this query
-                    max_pages = args.expand_pages if (is_expanded and getattr(args, "expand_pages", None)) else args.pages
                     if args.until_empty:
                         if (not next_cur and (not any(len(lists.get(k, [])) for k in selected_keys))) or (
                             args.max_no_progress_pages > 0 and no_prog >= args.max_no_progress_pages
@@ -2176,6 +2576,8 @@ def main():
                         if pages >= max_pages:
                             break
                     cursor = next_cur
+                if next_task is not None and not next_task.done():
+                    next_task.cancel()
 
                 # If nothing surfaced for this keyword and html-fallback is enabled, run expand-from-url
                 if found_any == 0 and getattr(args, "html_fallback", False):
@@ -2209,35 +2611,27 @@ def main():
                     except Exception as e:
                         _log(f"[search-keywords] html-fallback failed for '{q}': {e}")
 
+            # Page queries from a shared queue with a few workers, so one keyword with deep
+            # pagination or expansions does not hold up the rest
+            queue: asyncio.Queue = asyncio.Queue()
+            for item in queries:
+                queue.put_nowait(item)
+
+            async def _worker() -> None:
+                while True:
+                    try:
+                        q, is_expanded = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await _one_query(q, is_expanded)
+
+            n_workers = max(1, min(int(getattr(args, "query_concurrency", 1) or 1), len(queries)))
+            await asyncio.gather(*(_worker() for _ in range(n_workers)))
+
             # Post actions
-            if args.auto_embed or args.auto_index:
-                try:
-                    cmd_embed()
-                except Exception as e:
-                    print(f"Auto-embed failed: {e}")
-            if args.auto_index:
-                try:
-                    import faiss  # type: ignore
-                    import numpy as _np
-                    st2 = PdbStorage()
-                    df2 = st2.load_joined()
-                    rows = df2.dropna(subset=["vector"]).reset_index(drop=True)
-                    if rows.empty:
-                        print("No vectors found; run embed first.")
-                    else:
-                        mat = _np.vstack(rows["vector"].to_list()).astype("float32")
-                        norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-                        mat = mat / norms
-                        index = faiss.IndexFlatIP(mat.shape[1])
-                        index.add(mat)
-                        outp = _Path(args.index_out)
-                        outp.parent.mkdir(parents=True, exist_ok=True)
-                        faiss.write_index(index, str(outp))
-                        (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(rows["cid"].astype(str).tolist()), encoding="utf-8")
-                        print(f"Indexed {len(rows)} vectors to {outp}")
-                except Exception as e:
-                    print(f"Auto-index failed: {e}")
-            _log(f"Done. New: {total_new} Updated: {total_updated}")
+            await flusher.flush()
+            _auto_embed_and_index(args, store)
+            _log(f"Done. New: {flusher.new} Updated: {flusher.updated}")
             _log("[search-keywords] end")
             if log_fp:
                 try:
@@ -2245,30 +2639,26 @@ def main():
                 except Exception:
                     pass
         try:
-            asyncio.run(_run())
+            _run_async(_run())
         except Exception as e:
             print(f"search-keywords failed: {e}")
         return
     elif args.cmd == "export-characters":
         import pandas as pd
         from pathlib import Path as _Path
-        store = PdbStorage()
+        store = _store()
         raw_path = store.raw_path
         if not raw_path.exists():
             print(f"Missing raw parquet: {raw_path}")
             return
-        df = pd.read_parquet(raw_path)
         rows: list[dict] = []
-        for _, row in df.iterrows():
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            if not isinstance(obj, dict):
+        for rcid, pb in _iter_raw_rows(raw_path, ("cid", "payload_bytes")):
+            obj = _decode(pb)
+            if obj is None:
                 continue
-            is_char = obj.get("isCharacter") is True or obj.get("_from_character_group") is True or obj.get("_seed_sub_cat_id") is not None
-            if not is_char:
+            # Most stored rows are not characters: reject them with one bound .get
+            get = obj.get
+            if not (get("isCharacter") is True or get("_from_character_group") is True or get("_seed_sub_cat_id") is not None):
                 continue
             # Build candidate names and pick the most descriptive
             candidates: list[str] = []
@@ -2348,31 +2738,14 @@ def main():
             except Exception:
                 pass
             # Deduplicate, remove known MBTI codes
-            seen_c = set()
-            uniq_candidates: list[str] = []
-            for c in candidates:
-                if not isinstance(c, str):
-                    continue
-                if c in seen_c:
-                    continue
-                seen_c.add(c)
-                uniq_candidates.append(c)
+            uniq_candidates: list[str] = list(dict.fromkeys(c for c in candidates if isinstance(c, str)))
             if not uniq_candidates:
                 continue
             nm0 = uniq_candidates[0].strip().upper()
             if nm0 in {"INTJ","INTP","ENTJ","ENTP","INFJ","INFP","ENFJ","ENFP","ISTJ","ISFJ","ESTJ","ESFJ","ISTP","ISFP","ESTP","ESFP"}:
                 continue
-            rec: dict = {"cid": str(row.get("cid")), "_source": obj.get("_source")}
-            pid = None
-            for k in ("id", "profileId", "profileID", "profile_id", "_profile_id"):
-                v = obj.get(k)
-                if isinstance(v, int):
-                    pid = v; break
-                if isinstance(v, str):
-                    try:
-                        pid = int(v); break
-                    except Exception:
-                        pass
+            rec: dict = {"cid": str(rcid), "_source": obj.get("_source")}
+            pid = _get_pid(obj, _PAYLOAD_PID_KEYS)
             if pid is not None:
                 rec["pid"] = pid
             best = max(uniq_candidates, key=lambda s: len(s)) if uniq_candidates else None
@@ -2396,50 +2769,27 @@ def main():
         import pandas as pd
         from pathlib import Path as _Path
         import faiss  # type: ignore
-        import numpy as _np
         chars_path = _Path(getattr(args, "char_parquet", "data/bot_store/pdb_characters.parquet"))
         if not chars_path.exists():
             print(f"Missing characters parquet: {chars_path}. Run export-characters first.")
             return
-        store = PdbStorage()
-        df = store.load_joined()
+        import pyarrow.parquet as pq
+        store = _store()
         try:
-            cdf = pd.read_parquet(chars_path)[["cid"]]
+            char_cids = set(pd.read_parquet(chars_path, columns=["cid"])["cid"].astype(str))
         except Exception as e:
             print(f"Failed to read characters parquet: {e}")
             return
-        merged = df.merge(cdf, on="cid", how="inner").dropna(subset=["vector"]).reset_index(drop=True)
-        if merged.empty:
+        # Vector matrix (majority embedding dimension only) restricted to character cids;
+        # payloads are only read later, for names the characters parquet lacks
+        all_cids, mat = store.load_vector_matrix()
+        keep = [i for i, c in enumerate(all_cids) if c in char_cids]
+        if not keep:
             print("No vectors for character rows; run embed first.")
             return
-        # Ensure consistent embedding dimension; filter to majority dimension
-        dims = []
-        for v in merged["vector"].to_list():
-            try:
-                dims.append(len(v))
-            except Exception:
-                dims.append(None)
-        from collections import Counter as _Counter
-        dim_counts = _Counter([d for d in dims if isinstance(d, int)])
-        if not dim_counts:
-            print("Vectors present but dimensions unknown; cannot index.")
-            return
-        target_dim, _ = max(dim_counts.items(), key=lambda kv: kv[1])
-        if len(dim_counts) > 1:
-            before = len(merged)
-            merged = merged[[len(v) == target_dim for v in merged["vector"].to_list()]].reset_index(drop=True)
-            after = len(merged)
-            print(f"Note: filtered mixed embedding dims to {target_dim}-d ({after}/{before} rows kept)")
-        mat = _np.vstack(merged["vector"].to_list()).astype("float32")
-        norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-        mat = mat / norms
-        index = faiss.IndexFlatIP(mat.shape[1])
-        index.add(mat)
         outp = _Path(args.out)
-        outp.parent.mkdir(parents=True, exist_ok=True)
-        faiss.write_index(index, str(outp))
-        cid_list = merged["cid"].astype(str).tolist()
-        (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(cid_list), encoding="utf-8")
+        cid_list = [all_cids[i] for i in keep]
+        _write_cosine_index(mat[keep], cid_list, outp, getattr(args, "index_type", "auto"))
         # Write names file aligned with cids for faster lookups in search
         name_map: dict[str, str] = {}
         # Prefer names from characters parquet when available
@@ -2447,45 +2797,32 @@ def main():
         try:
             cdf2 = pd.read_parquet(chars_path)
             if "cid" in cdf2.columns and "name" in cdf2.columns:
-                for _, r in cdf2.iterrows():
-                    scid = str(r.get("cid"))
-                    nm = r.get("name")
+                for rcid, nm in cdf2[["cid", "name"]].itertuples(index=False, name=None):
                     if isinstance(nm, str) and nm:
-                        char_names[scid] = nm
+                        char_names[str(rcid)] = nm
         except Exception as e:
             print(f"Note: could not read character names from {chars_path}: {e}")
-        # Fallback to joined payload names for any missing entries
-        for _, row in merged.iterrows():
-            scid = str(row.get("cid"))
-            if scid in char_names:
-                name_map[scid] = char_names[scid]
-                continue
-            pb = row.get("payload_bytes")
-            nm = None
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            if isinstance(obj, dict):
-                for k in ("name","title","display_name","username","subcategory"):
-                    v = obj.get(k)
-                    if isinstance(v, str) and v:
-                        nm = v; break
-            name_map[scid] = nm or "(unknown)"
+        # Fallback to payload names for any missing entries
+        missing = [c for c in cid_list if c not in char_names]
+        name_map.update((c, char_names[c]) for c in cid_list if c in char_names)
+        if missing:
+            hits = pq.read_table(store.raw_path, columns=["cid", "payload_bytes"], filters=[("cid", "in", missing)])
+            for scid, pb in zip(hits.column("cid").to_pylist(), hits.column("payload_bytes").to_pylist()):
+                obj = _decode(pb)
+                name_map[scid] = _pick_name(obj) if obj is not None else "(unknown)"
         names_out = outp.with_suffix(outp.suffix + ".names")
         names_out.write_text("\n".join([name_map.get(c, "(unknown)") for c in cid_list]), encoding="utf-8")
         print(f"Wrote names for {len(cid_list)} entries to {names_out}")
-        print(f"Indexed {len(merged)} character vectors to {outp}")
+        print(f"Indexed {len(cid_list)} character vectors to {outp}")
     elif args.cmd == "refresh-names":
         import pandas as pd
         from pathlib import Path as _Path
         idxp = _Path(getattr(args, "index", "data/bot_store/pdb_faiss_char.index"))
-        map_path = idxp.with_suffix(idxp.suffix + ".cids")
         names_out = idxp.with_suffix(idxp.suffix + ".names")
-        if not map_path.exists():
-            print(f"Missing cid map: {map_path}. Build the index first.")
+        cids = _read_cid_map(idxp)
+        if cids is None:
+            print(f"Missing cid map for {idxp}. Build the index first.")
             return
-        cids = [l.strip() for l in map_path.read_text(encoding="utf-8").splitlines() if l.strip()]
         # Prefer names from characters parquet
         char_names: dict[str, str] = {}
         char_path = _Path(getattr(args, "char_parquet", "data/bot_store/pdb_characters.parquet"))
@@ -2493,34 +2830,17 @@ def main():
             try:
                 cdf = pd.read_parquet(char_path)
                 if "cid" in cdf.columns and "name" in cdf.columns:
-                    for _, r in cdf.iterrows():
-                        scid = str(r.get("cid"))
-                        nm = r.get("name")
+                    for rcid, nm in cdf[["cid", "name"]].itertuples(index=False, name=None):
                         if isinstance(nm, str) and nm:
-                            char_names[scid] = nm
+                            char_names[str(rcid)] = nm
             except Exception as e:
                 print(f"Note: could not read character names from {char_path}: {e}")
-        # Fallback to joined payload names
-        store = PdbStorage()
-        df = store.load_joined()
+        # Fallback to payload names, pre-decoded (same key order) in the decoded sidecar
+        tbl = _store().load_decoded(["cid", "name"])
         fallback_names: dict[str, str] = {}
-        for _, row in df.iterrows():
-            scid = str(row.get("cid"))
-            if scid in fallback_names or scid in char_names:
-                continue
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            nm = None
-            if isinstance(obj, dict):
-                for k in ("name", "title", "display_name", "username", "subcategory"):
-                    v = obj.get(k)
-                    if isinstance(v, str) and v:
-                        nm = v
-                        break
-            fallback_names[scid] = nm or "(unknown)"
+        for scid, nm in zip(tbl.column("cid").to_pylist(), tbl.column("name").to_pylist()):
+            if scid not in char_names:
+                fallback_names.setdefault(scid, nm or "(unknown)")
         lines = [(char_names.get(c) or fallback_names.get(c) or "(unknown)") for c in cids]
         names_out.write_text("\n".join(lines), encoding="utf-8")
         print(f"Wrote {len(lines)} names to {names_out}")
@@ -2588,12 +2908,7 @@ def main():
             except Exception:
                 pass
             # De-duplicate while preserving order
-            _seen_kw = set()
-            _uniq: list[str] = []
-            for _k in kw:
-                if _k not in _seen_kw:
-                    _seen_kw.add(_k)
-                    _uniq.append(_k)
+            _uniq: list[str] = list(dict.fromkeys(kw))
             kw = _uniq
             if not kw:
                 print("No keywords provided.")
@@ -2758,73 +3073,70 @@ def main():
             except Exception:
                 pass
     elif args.cmd == "summarize":
-        import pandas as pd
         from pathlib import Path
         npath = Path(args.normalized)
         if not npath.exists():
             print(f"Missing normalized parquet: {npath}. Run 'pdb-cli export' first.")
             return
-        df = pd.read_parquet(npath)
-        print(f"Rows: {len(df)}")
-        for col in ["mbti", "socionics", "big5"]:
-            if col in df.columns:
-                vc = df[col].dropna().value_counts().head(10)
-                if not vc.empty:
-                    print(f"Top {col} values:")
-                    for k, v in vc.items():
-                        print(f"  {k}: {int(v)}")
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        # Row count from the footer; read only the summarized columns and count values
+        # with Arrow's hash kernel instead of building pandas Series
+        print(f"Rows: {pq.read_metadata(npath).num_rows}")
+        present = set(pq.read_schema(npath).names)
+        cols = [c for c in ["mbti", "socionics", "big5"] if c in present]
+        tbl = pq.read_table(npath, columns=cols)
+        for col in cols:
+            vc = pc.value_counts(pc.drop_null(tbl.column(col)))
+            if len(vc) == 0:
+                continue
+            top = vc.take(pc.array_sort_indices(vc.field("counts"), order="descending")[:10])
+            print(f"Top {col} values:")
+            for k, v in zip(top.field("values").to_pylist(), top.field("counts").to_pylist()):
+                print(f"  {k}: {int(v)}")
     elif args.cmd == "export":
         import pandas as pd
         from pathlib import Path
-        store = PdbStorage()
+        store = _store()
         raw_path = store.raw_path
         vec_path = store.vec_path
         if not raw_path.exists():
             print(f"Missing raw parquet: {raw_path}")
             return
-        df = pd.read_parquet(raw_path)
+        import pyarrow.parquet as pq
         rows: list[dict] = []
-        # extract a small set of normalized fields from payloads
-        for _, row in df.iterrows():
-            cid = str(row.get("cid"))
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            if not isinstance(obj, dict):
-                continue
-            rec: dict = {"cid": cid}
-            # profile identity
-            pid = None
-            for k in ("id", "profileId", "profileID", "profile_id", "_profile_id"):
-                v = obj.get(k)
-                if isinstance(v, int):
-                    pid = v; break
-                if isinstance(v, str):
-                    try:
-                        pid = int(v); break
-                    except Exception:
-                        pass
-            if pid is not None:
-                rec["pid"] = pid
-            # common name/title field guesses
-            for k in ("name", "title", "display_name", "username"):
-                v = obj.get(k)
-                if isinstance(v, str) and v:
-                    rec["name"] = v
-                    break
-            # typology hints if present
-            for k in ("mbti", "socionics", "big5", "enneagram"):
-                v = obj.get(k)
-                if v is not None:
-                    rec[k] = v
-            rows.append(rec)
+        # extract a small set of normalized fields from payloads, streaming the raw
+        # parquet in record batches instead of loading it whole
+        pf = pq.ParquetFile(raw_path)
+        for rb in pf.iter_batches(batch_size=65536, columns=["cid", "payload_bytes"]):
+            for rcid, pb in zip(rb.column(0).to_pylist(), rb.column(1).to_pylist()):
+                cid = str(rcid)
+                obj = _decode(pb)
+                if obj is None:
+                    continue
+                rec: dict = {"cid": cid}
+                # profile identity
+                pid = _get_pid(obj, _PAYLOAD_PID_KEYS)
+                if pid is not None:
+                    rec["pid"] = pid
+                # common name/title field guesses
+                for k in ("name", "title", "display_name", "username"):
+                    v = obj.get(k)
+                    if isinstance(v, str) and v:
+                        rec["name"] = v
+                        break
+                # typology hints if present
+                for k in ("mbti", "socionics", "big5", "enneagram"):
+                    v = obj.get(k)
+                    if v is not None:
+                        rec[k] = v
+                rows.append(rec)
         out = pd.DataFrame(rows).drop_duplicates(subset=["cid"]) if rows else pd.DataFrame(columns=["cid","pid","name"]) 
         # attach vector presence flag
         if vec_path.exists():
             try:
-                vdf = pd.read_parquet(vec_path)[["cid"]]
+                # only the cid column: skip decoding every stored vector
+                vdf = pd.read_parquet(vec_path, columns=["cid"])
                 vdf["has_vector"] = True
                 out = out.merge(vdf, on="cid", how="left")
                 out["has_vector"] = out["has_vector"].fillna(False)
@@ -2832,57 +3144,31 @@ def main():
                 pass
         outp = Path(getattr(args, "out", "data/bot_store/pdb_profiles_normalized.parquet"))
         outp.parent.mkdir(parents=True, exist_ok=True)
-        out.to_parquet(outp, index=False)
+        out.to_parquet(outp, index=False, compression="zstd")
         print(f"Exported {len(out)} rows to {outp}")
     elif args.cmd == "scrape-v1-missing":
-        import pandas as pd
+        import contextlib
         import random as _random
-        import json as _json
         from pathlib import Path as _Path
-        store = PdbStorage()
+        store = _store()
         raw_path = store.raw_path
         if not raw_path.exists():
             print(f"Missing raw parquet: {raw_path}")
             return
-        df = pd.read_parquet(raw_path)
-        seen_ids: set[int] = set()
-        have_v1: set[int] = set()
-        for _, row in df.iterrows():
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            if not isinstance(obj, dict):
-                continue
-            pid = None
-            if obj.get("_source") == "v1_profile":
-                v = obj.get("_profile_id")
-                if isinstance(v, int):
-                    have_v1.add(v)
-                elif isinstance(v, str):
-                    try:
-                        have_v1.add(int(v))
-                    except Exception:
-                        pass
-            if pid is None:
-                for k in ("id", "profileId", "profileID", "profile_id", "_profile_id"):
-                    v = obj.get(k)
-                    if isinstance(v, int):
-                        pid = v; break
-                    if isinstance(v, str):
-                        try:
-                            pid = int(v); break
-                        except Exception:
-                            pass
-            if isinstance(pid, int):
-                seen_ids.add(pid)
-        missing = [i for i in seen_ids if i not in have_v1]
+        import pyarrow.compute as pc
+        # Profile ids and v1 provenance come from the decoded sidecar, which is only
+        # rebuilt when the raw parquet has changed since the last command. One read
+        # projects the three columns both id sets need.
+        tbl = store.load_decoded(["pid", "_source", "_profile_id"])
+        seen = np.unique(pc.drop_null(tbl.column("pid")).to_numpy())
+        v1_ids = tbl.column("_profile_id").filter(pc.equal(tbl.column("_source"), "v1_profile"))
+        have = np.unique(pc.drop_null(v1_ids).to_numpy())
+        missing = np.setdiff1d(seen, have, assume_unique=True).tolist()
         if args.shuffle:
             _random.shuffle(missing)
         if args.max and args.max > 0:
             missing = missing[: args.max]
-        print(f"Missing v1 count: {len(missing)} (seen={len(seen_ids)}, have_v1={len(have_v1)})")
+        print(f"Missing v1 count: {len(missing)} (seen={len(seen)}, have_v1={len(have)})")
         if args.dry_run or not missing:
             return
         async def _run():
@@ -2894,13 +3180,11 @@ def main():
                 v1_kwargs["concurrency"] = args.concurrency
             if getattr(args, "timeout", None) is not None:
                 v1_kwargs["timeout_s"] = args.timeout
+            if getattr(args, "http2", None) is not None:
+                v1_kwargs["http2"] = args.http2
             if args.v1_headers:
-                try:
-                    v1_kwargs["headers"] = _json.loads(args.v1_headers)
-                except Exception:
-                    v1_kwargs["headers"] = None
-            from .pdb_client import PdbClient as _PdbClient
-            client_v1 = _PdbClient(**v1_kwargs)
+                v1_kwargs["headers"] = args.v1_headers
+            client_v1 = _shared_client(**v1_kwargs)
             # optional v2 fallback client
             client_v2 = None
             if args.fallback_v2:
@@ -2911,72 +3195,75 @@ def main():
                     v2_kwargs["concurrency"] = args.concurrency
                 if getattr(args, "timeout", None) is not None:
                     v2_kwargs["timeout_s"] = args.timeout
+                if getattr(args, "http2", None) is not None:
+                    v2_kwargs["http2"] = args.http2
                 if args.v2_headers:
-                    try:
-                        v2_kwargs["headers"] = _json.loads(args.v2_headers)
-                    except Exception:
-                        v2_kwargs["headers"] = None
-                client_v2 = _PdbClient(**v2_kwargs)
+                    v2_kwargs["headers"] = args.v2_headers
+                client_v2 = _shared_client(**v2_kwargs)
             scraped = 0
-            for pid in missing:
-                try:
-                    data = await client_v1.get_profile(pid)
-                except Exception as e:
-                    print(f"v1 get_profile failed for id={pid}: {e}")
-                    # Try v2 fallback if enabled
-                    if client_v2 is not None:
+            # Accumulate profiles and upsert in large batches: each upsert_raw call
+            # rewrites the whole parquet, so per-profile calls are O(N^2) overall.
+            batch: list[dict] = []
+            flush_every = max(int(getattr(args, "upsert_batch", 1000) or 1), 1)
+
+            async def _queue(obj: dict) -> None:
+                nonlocal scraped
+                batch.append(obj)
+                if len(batch) >= flush_every:
+                    n, u = await asyncio.to_thread(store.upsert_raw, batch)
+                    scraped += n + u
+                    batch.clear()
+
+            async with contextlib.AsyncExitStack() as stack:
+                await stack.enter_async_context(client_v1)
+                if client_v2 is not None:
+                    await stack.enter_async_context(client_v2)
+                async def _fetch_one(pid: int) -> Optional[dict]:
+                    try:
+                        data = await client_v1.get_profile(pid)
+                    except Exception as e:
+                        print(f"v1 get_profile failed for id={pid}: {e}")
+                        # Try v2 fallback if enabled
+                        if client_v2 is None:
+                            return None
                         try:
                             v2data = await client_v2.fetch_json(f"profiles/{pid}")
                         except Exception as e2:
                             print(f"v2 fallback failed for id={pid}: {e2}")
-                            continue
+                            return None
                         obj = None
                         if isinstance(v2data, dict):
                             obj = v2data.get("data") if isinstance(v2data.get("data"), dict) else v2data
                         if not isinstance(obj, dict):
                             print(f"v2 fallback unexpected shape for id={pid}")
-                            continue
-                        main_obj = {**obj, "_source": "v2_profile", "_profile_id": pid, "_fallback": "v2"}
-                        n, u = store.upsert_raw([main_obj])
-                        scraped += n + u
-                        continue
-                    else:
-                        continue
-                if not isinstance(data, dict):
-                    continue
-                main_obj = {**data, "_source": "v1_profile", "_profile_id": pid}
-                n, u = store.upsert_raw([main_obj])
-                scraped += n + u
+                            return None
+                        obj["_source"] = "v2_profile"
+                        obj["_profile_id"] = pid
+                        obj["_fallback"] = "v2"
+                        return obj
+                    if not isinstance(data, dict):
+                        return None
+                    # data is freshly decoded for this request; annotate it in place
+                    data["_source"] = "v1_profile"
+                    data["_profile_id"] = pid
+                    return data
+
+                # Fetch in windows of concurrent requests; the clients' own semaphore and
+                # throttle still bound in-flight requests and the request rate
+                window = max(int(getattr(args, "v1_concurrency", 128) or 1), 1)
+                for i in range(0, len(missing), window):
+                    chunk = missing[i : i + window]
+                    results = await asyncio.gather(*(_fetch_one(pid) for pid in chunk), return_exceptions=True)
+                    for res in results:
+                        if isinstance(res, dict):
+                            await _queue(res)
+                if batch:
+                    n, u = await asyncio.to_thread(store.upsert_raw, batch)
+                    scraped += n + u
+                    batch.clear()
             print(f"Scraped v1 profiles: {scraped}")
-            if args.auto_embed or args.auto_index:
-                try:
-                    cmd_embed()
-                except Exception as e:
-                    print(f"Auto-embed failed: {e}")
-            if args.auto_index:
-                try:
-                    import faiss  # type: ignore
-                    import numpy as _np
-                    from pathlib import Path as _Path
-                    st2 = PdbStorage()
-                    df2 = st2.load_joined()
-                    rows = df2.dropna(subset=["vector"]).reset_index(drop=True)
-                    if rows.empty:
-                        print("No vectors found; run embed first.")
-                    else:
-                        mat = _np.vstack(rows["vector"].to_list()).astype("float32")
-                        norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-                        mat = mat / norms
-                        index = faiss.IndexFlatIP(mat.shape[1])
-                        index.add(mat)
-                        outp = _Path(args.index_out)
-                        outp.parent.mkdir(parents=True, exist_ok=True)
-                        faiss.write_index(index, str(outp))
-                        (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(rows["cid"].astype(str).tolist()), encoding="utf-8")
-                        print(f"Indexed {len(rows)} vectors to {outp}")
-                except Exception as e:
-                    print(f"Auto-index failed: {e}")
-        asyncio.run(_run())
+            _auto_embed_and_index(args, store)
+        _run_async(_run())
         return
     elif args.cmd == "cache-clear":
         from pathlib import Path
@@ -2990,12 +3277,21 @@ def main():
         if not d.exists():
             print(f"No cache directory at {d}")
             return
-        shutil.rmtree(d)
+        # Rename first so the cache is gone immediately, then unlink the tree in the
+        # background; the thread is non-daemon so the interpreter waits for it on exit
+        import threading as _threading
+        tmp = d.with_name(d.name + f".deleting-{os.getpid()}")
+        try:
+            d.rename(tmp)
+        except OSError:
+            shutil.rmtree(d)
+        else:
+            _threading.Thread(target=shutil.rmtree, args=(tmp,), kwargs={"ignore_errors": True}, daemon=False).start()
         print(f"Cleared cache at {d}")
     elif args.cmd == "hot-queries":
         async def _run():
             client = _make_client(args)
-            store = PdbStorage()
+            store = _store()
             try:
                 data = await client.fetch_json("search/hot_queries")
             except Exception as e:
@@ -3010,7 +3306,8 @@ def main():
             batch = []
             for it in items or []:
                 if isinstance(it, dict):
-                    batch.append({**it, "_source": "v2_hot_queries"})
+                    it["_source"] = "v2_hot_queries"
+                    batch.append(it)
                 elif isinstance(it, str):
                     batch.append({"keyword": it, "_source": "v2_hot_queries"})
             if not batch:
@@ -3027,20 +3324,30 @@ def main():
             if getattr(args, "dry_run", False):
                 print(f"Would upsert {len(batch)} hot queries (dry-run)")
             else:
-                n, u = store.upsert_raw(batch)
+                n, u = await asyncio.to_thread(store.upsert_raw, batch)
                 print(f"Upserted hot queries: new={n} updated={u}")
-        asyncio.run(_run())
+                # Keep the bare keys in a tiny sidecar so follow-hot never has to recover them
+                # from the raw store
+                try:
+                    import pandas as pd
+                    from .pdb_storage import _atomic_write_parquet
+                    keys = [it.get("keyword") or it.get("key") or it.get("query") for it in batch]
+                    keys = [k for k in keys if isinstance(k, str) and k]
+                    _atomic_write_parquet(pd.DataFrame({"key": keys}), store.raw_path.parent / "hot_query_keys.parquet")
+                except Exception as e:
+                    print(f"Warning: could not write hot query keys sidecar: {e}")
+        _run_async(_run())
         return
     elif args.cmd == "tag-keyword":
         import pandas as pd
         from pathlib import Path as _Path
-        store = PdbStorage()
+        store = _store()
         raw_path = store.raw_path
         if not raw_path.exists():
             print(f"Missing raw parquet: {raw_path}")
             return
-        df = pd.read_parquet(raw_path)
-        if df.empty:
+        import pyarrow.parquet as pq
+        if pq.read_metadata(raw_path).num_rows == 0:
             print("No rows in raw parquet.")
             return
         kw = getattr(args, "keyword", "").strip()
@@ -3065,40 +3372,44 @@ def main():
         to_update: list[dict] = []
         matched = 0
         updated = 0
-        for _, row in df.iterrows():
-            pb = row.get("payload_bytes")
-            try:
-                obj = orjson.loads(pb) if isinstance(pb, (bytes, bytearray)) else (json.loads(pb) if isinstance(pb, str) else (pb if isinstance(pb, dict) else None))
-            except Exception:
-                obj = None
-            if not isinstance(obj, dict):
+        if srcs:
+            # _source is denormalized in the decoded sidecar: find the matching cids there
+            # and read (and decode) only those raw payloads
+            import pyarrow.dataset as ds
+            hits = store.load_decoded(["cid"], filter=ds.field("_source").isin(list(srcs)))
+            if hits.num_rows == 0:
+                print("No rows matched for update (matched=0, to_update=0)")
+                return
+            payloads = pq.read_table(
+                raw_path,
+                columns=["payload_bytes"],
+                filters=[("cid", "in", hits.column("cid").to_pylist())],
+                memory_map=True,
+            ).column(0)
+            raw_rows = zip(payloads.to_pylist())
+        else:
+            raw_rows = _iter_raw_rows(raw_path)
+        for (pb,) in raw_rows:
+            obj = _decode(pb)
+            if obj is None:
                 continue
             s = obj.get("_source")
             if srcs and s not in srcs:
                 continue
             ok_seed = True
+            # most rows lack these keys; _as_int returns early on None instead of raising
             if seed_pids:
-                sp = obj.get("_seed_pid")
-                try:
-                    spv = int(sp)
-                except Exception:
-                    spv = None
-                ok_seed = spv in seed_pids if spv is not None else False
+                ok_seed = _as_int(obj.get("_seed_pid")) in seed_pids
             ok_sub = True
             if subcats:
-                sc = obj.get("_seed_sub_cat_id")
-                try:
-                    scv = int(sc)
-                except Exception:
-                    scv = None
-                ok_sub = scv in subcats if scv is not None else False
+                ok_sub = _as_int(obj.get("_seed_sub_cat_id")) in subcats
             if not (ok_seed and ok_sub):
                 continue
             matched += 1
             prev_kw = obj.get("_search_keyword")
             if isinstance(prev_kw, str) and prev_kw.strip() == kw:
                 continue
-            obj = {**obj, "_search_keyword": kw}
+            obj["_search_keyword"] = kw
             to_update.append(obj)
         if not to_update:
             print(f"No rows matched for update (matched={matched}, to_update=0)")
@@ -3158,13 +3469,7 @@ def main():
                 for sc in subcats:
                     if not isinstance(sc, dict):
                         continue
-                    sid = None
-                    for kk in ("id", "profileId", "profileID", "profile_id"):
-                        v = sc.get(kk)
-                        if isinstance(v, int):
-                            sid = v; break
-                        if isinstance(v, str) and v.isdigit():
-                            sid = int(v); break
+                    sid = _get_pid(sc)
                     if not isinstance(sid, int) or sid in seen_ids:
                         continue
                     seen_ids.add(sid)
@@ -3210,7 +3515,7 @@ def main():
                     log_fp.close()
                 except Exception:
                     pass
-        asyncio.run(_run())
+        _run_async(_run())
         return
     elif args.cmd == "auth-check":
         async def _run():
@@ -3290,7 +3595,7 @@ def main():
                     log_fp.close()
                 except Exception:
                     pass
-        asyncio.run(_run())
+        _run_async(_run())
         return
     elif args.cmd == "expand-related":
         import re as _re
@@ -3300,10 +3605,9 @@ def main():
             # Prepare optional meta-client for richer related data when available
             meta_client = None
             try:
-                from .pdb_client import PdbClient as _PdbClient
                 # Reuse current client's settings/headers if possible
                 # Fallback to a known meta base URL
-                meta_client = _PdbClient(
+                meta_client = _shared_client(
                     base_url="https://meta.personality-database.com/api/v2",
                     concurrency=getattr(client, "concurrency", 4),
                     rate_per_minute=getattr(client, "rate_per_minute", 60),
@@ -3312,7 +3616,7 @@ def main():
                 )
             except Exception:
                 meta_client = None
-            store = PdbStorage()
+            store = _store()
             # collect seed IDs
             seeds: list[int] = []
             if getattr(args, "ids", None):
@@ -3342,12 +3646,7 @@ def main():
                     except Exception:
                         pass
             # de-duplicate, preserve order
-            seen = set()
-            uniq: list[int] = []
-            for s in seeds:
-                if s not in seen:
-                    seen.add(s)
-                    uniq.append(s)
+            uniq: list[int] = list(dict.fromkeys(seeds))
             if args.max_ids and args.max_ids > 0:
                 uniq = uniq[: args.max_ids]
             if not uniq:
@@ -3359,9 +3658,11 @@ def main():
                 target_lists = {"profiles"}
             elif isinstance(args.lists, str) and args.lists:
                 target_lists = {s.strip() for s in args.lists.split(",") if s.strip()}
-            total = 0
+            flusher = _Flusher(store, getattr(args, "upsert_batch", 2000))
             forced_kw = getattr(args, "set_keyword", None)
-            for sid in uniq:
+            # Collect related (+ meta) lists for all seeds concurrently, bounded by a
+            # semaphore; annotation and upserts below still run seed by seed, in order
+            async def _collect(sid: int) -> dict[str, list]:
                 lists: dict[str, list] = {}
                 # Helper to merge list-like fields into canonical keys
                 def _merge_lists_from_payload(pl: dict) -> None:
@@ -3402,13 +3703,7 @@ def main():
                                     if isinstance(x, dict):
                                         # Heuristic: looks like a profile if it has a name/title and an id-ish field
                                         has_name = any(isinstance(x.get(k), str) and x.get(k) for k in ("name","title","subcategory","display_name","username"))
-                                        id_val = None
-                                        for kk in ("id","profileId","profile_id","profileID"):
-                                            v = x.get(kk)
-                                            if isinstance(v, int):
-                                                id_val = v; break
-                                            if isinstance(v, str) and v.isdigit():
-                                                id_val = int(v); break
+                                        id_val = _get_pid(x)
                                         is_char_flag = x.get("isCharacter") is True
                                         if (has_name and id_val is not None) or is_char_flag:
                                             prof_like.append(x)
@@ -3425,13 +3720,27 @@ def main():
                                 lists["profiles"] = base + prof_like
                     except Exception:
                         pass
-                selected = set(lists.keys()) if target_lists is None else (set(lists.keys()) & set(target_lists))
+                return lists
+
+            sem = asyncio.Semaphore(max(int(getattr(args, "related_concurrency", 16) or 1), 1))
+
+            async def _bounded(sid: int) -> dict[str, list]:
+                async with sem:
+                    return await _collect(sid)
+
+            collected = await asyncio.gather(*(_bounded(sid) for sid in uniq))
+            for sid, lists in zip(uniq, collected):
+                selected = set(lists) if target_lists is None else (lists.keys() & target_lists)
                 batch: list[dict] = []
+                emitted: set[int] = set()
                 for key in sorted(selected):
                     for it in lists.get(key, []) or []:
                         if not isinstance(it, dict):
                             continue
-                        obj = {**it, "_source": f"v2_related:{key}", "_seed_id": sid, "_seed_sub_cat_id": sid}
+                        obj = _for_annotation(it, emitted)
+                        obj["_source"] = f"v2_related:{key}"
+                        obj["_seed_id"] = sid
+                        obj["_seed_sub_cat_id"] = sid
                         if isinstance(forced_kw, str) and forced_kw.strip():
                             obj["_search_keyword"] = forced_kw.strip()
                         if args.force_character_group:
@@ -3453,15 +3762,15 @@ def main():
                 if args.dry_run:
                     print(f"id={sid}: would upsert {len(batch)} items (dry-run)")
                 else:
-                    n, u = store.upsert_raw(batch)
-                    total += (n + u)
-                    print(f"id={sid}: upserted new={n} updated={u}")
+                    await flusher.add(batch)
+                    print(f"id={sid}: queued {len(batch)} items")
             if not args.dry_run:
-                print(f"Done. Upserted total rows: {total}")
-        asyncio.run(_run())
+                await flusher.flush()
+                print(f"Done. Upserted total rows: {flusher.new + flusher.updated} (new={flusher.new} updated={flusher.updated})")
+        _run_async(_run())
         return
     elif args.cmd == "expand-from-url":
-        asyncio.run(_expand_from_url_async(args))
+        _run_async(_expand_from_url_async(args))
         return
     elif args.cmd == "peek-meta":
         import re as _re
@@ -3470,8 +3779,7 @@ def main():
             # Build meta client reusing headers/limits
             meta_client = None
             try:
-                from .pdb_client import PdbClient as _PdbClient
-                meta_client = _PdbClient(
+                meta_client = _shared_client(
                     base_url="https://meta.personality-database.com/api/v2",
                     concurrency=getattr(base_client, "concurrency", 4),
                     rate_per_minute=getattr(base_client, "rate_per_minute", 60),
@@ -3494,21 +3802,10 @@ def main():
                     if tok.isdigit():
                         ids.append(int(tok))
             # De-duplicate
-            seen = set()
-            uniq: list[int] = []
-            for i in ids:
-                if i not in seen:
-                    seen.add(i)
-                    uniq.append(i)
+            uniq: list[int] = list(dict.fromkeys(ids))
             if not uniq:
                 print("No IDs provided. Use --id or --ids.")
                 return
-            def _pick_name(obj: dict) -> str:
-                for k in ("name", "title", "display_name", "username", "subcategory"):
-                    v = obj.get(k)
-                    if isinstance(v, str) and v:
-                        return v
-                return "(unknown)"
             for pid in uniq:
                 try:
                     data = await meta_client.fetch_json(f"meta/profile/{pid}")
@@ -3541,27 +3838,21 @@ def main():
                         print("  "+", ".join(samples) + tail)
                 if getattr(args, "raw", False):
                     try:
-                        print(json.dumps(payload, ensure_ascii=False, indent=2))
+                        print(orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
                     except Exception:
                         try:
                             import pprint as _pp
                             _pp.pprint(payload)
                         except Exception:
                             pass
-        asyncio.run(_run())
+        _run_async(_run())
         return
     elif args.cmd == "search-top":
         import sys as _sys
         from pathlib import Path as _Path
-        def _pick_name(obj: dict) -> str:
-            for k in ("name", "title", "display_name", "username", "subcategory"):
-                v = obj.get(k)
-                if isinstance(v, str) and v:
-                    return v
-            return "(unknown)"
         async def _run():
             client = _make_client(args)
-            store = PdbStorage()
+            store = _store()
             q = args.keyword if getattr(args, "keyword", None) else getattr(args, "query", "")
             if getattr(args, "encoded", False) and isinstance(q, str) and q:
                 try:
@@ -3576,18 +3867,22 @@ def main():
                 target_lists = {"profiles"}
             elif isinstance(args.lists, str) and args.lists:
                 target_lists = {s.strip() for s in args.lists.split(",") if s.strip()}
-            total_new = total_updated = 0
+            flusher = _Flusher(store, getattr(args, "upsert_batch", 10000))
+            known = _known_cids(store) if not args.dry_run else set()
             cursor = args.next_cursor
             no_prog = 0
             pages = 0
             if args.verbose:
                 print(f"[debug] search-top start q='{q}' limit={args.limit} only_profiles={args.only_profiles}")
-            while True:
+            def _page_params(cur) -> dict:
                 params = {"limit": args.limit, "keyword": q}
-                if cursor:
-                    params["nextCursor"] = cursor
+                if cur:
+                    params["nextCursor"] = cur
+                return params
+            next_task: Optional[asyncio.Task] = asyncio.create_task(client.fetch_json("search/top", _page_params(cursor)))
+            while True:
                 try:
-                    data = await client.fetch_json("search/top", params)
+                    data = await next_task
                 except Exception as e:
                     print(f"search/top failed: {e}")
                     break
@@ -3601,6 +3896,11 @@ def main():
                             next_cur = v; break
                         if isinstance(v, str) and v.isdigit():
                             next_cur = int(v); break
+                # Prefetch the next page while this one is processed and upserted; the task
+                # is cancelled below if the loop stops here
+                next_task = None
+                if args.until_empty or pages + 1 < args.pages:
+                    next_task = asyncio.create_task(client.fetch_json("search/top", _page_params(next_cur)))
                 lists: dict[str, list] = {}
                 if isinstance(payload, dict):
                     for k, v in payload.items():
@@ -3619,38 +3919,29 @@ def main():
                         if alt_key in lists:
                             alt = lists.get(alt_key) or []
                             if alt:
-                                marked = [({**it, "_from_character_group": True} if isinstance(it, dict) else it) for it in alt]
+                                # Tag copies so the items still listed under alt_key keep their own provenance
+                                alt = [{**it, "_from_character_group": True} if isinstance(it, dict) else it for it in alt]
                                 base = lists.get("profiles") or []
-                                lists["profiles"] = (base + marked)
+                                lists["profiles"] = (base + alt)
                 if args.verbose:
                     key_counts = ", ".join(f"{k}:{len(lists.get(k, []) or [])}" for k in sorted(lists.keys()))
                     print(f"[debug] page={pages+1} keys={{ {key_counts} }} nextCursor={next_cur}")
-                selected_keys = set(lists.keys()) if target_lists is None else (set(lists.keys()) & set(target_lists))
+                selected_keys = set(lists) if target_lists is None else (lists.keys() & target_lists)
                 expanded_profiles: list[dict] = []
                 if args.expand_subcategories and "subcategories" in lists:
                     subcats = lists.get("subcategories", [])[: max(int(args.expand_max), 0)]
+                    sids: list[int] = []
                     for sc in subcats:
-                        sid = None
-                        if isinstance(sc, dict):
-                            for key in ("id", "profileId", "profile_id", "profileID"):
-                                v = sc.get(key)
-                                if isinstance(v, int): sid = v; break
-                                if isinstance(v, str) and v.isdigit(): sid = int(v); break
-                        if not isinstance(sid, int):
-                            continue
-                        try:
-                            rel = await client.fetch_json(f"profiles/{sid}/related")
-                        except Exception:
-                            continue
-                        rel_payload = rel.get("data") if isinstance(rel, dict) else rel
-                        rel_list = []
-                        if isinstance(rel_payload, dict):
-                            rel_list = rel_payload.get("relatedProfiles") or rel_payload.get("profiles") or []
-                        if not isinstance(rel_list, list):
-                            continue
+                        sid = _get_pid(sc) if isinstance(sc, dict) else None
+                        if isinstance(sid, int):
+                            sids.append(sid)
+                    annot = {"_source": "v2_related_from_subcategory", "_keyword": q}
+                    for rel_list in await _fetch_related_lists(client, sids):
                         for it in rel_list:
                             if isinstance(it, dict):
-                                expanded_profiles.append({**it, "_source": "v2_related_from_subcategory", "_keyword": q, "_from_character_group": True if args.force_character_group else it.get("_from_character_group") or False})
+                                it.update(annot)
+                                it["_from_character_group"] = True if args.force_character_group else it.get("_from_character_group") or False
+                                expanded_profiles.append(it)
                 # Optional: expand via boards and chase payload hints
                 async def _expand_by_term(term: str, tag: str) -> list[dict]:
                     try:
@@ -3675,15 +3966,19 @@ def main():
                             if alt_key in lists2:
                                 alt2 = lists2.get(alt_key) or []
                                 if alt2:
-                                    marked2 = [({**it, "_from_character_group": True} if isinstance(it, dict) else it) for it in alt2]
+                                    # Tag copies so the items still listed under alt_key keep their own provenance
+                                    alt2 = [{**it, "_from_character_group": True} if isinstance(it, dict) else it for it in alt2]
                                     base2 = lists2.get("profiles") or []
-                                    lists2["profiles"] = (base2 + marked2)
+                                    lists2["profiles"] = (base2 + alt2)
                     out: list[dict] = []
+                    emitted: set[int] = set()
                     for ksel in sorted(selected_keys):
+                        annot2 = {"_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": q}
                         for it2 in lists2.get(ksel, []) or []:
                             if not isinstance(it2, dict):
                                 continue
-                            obj2 = {**it2, "_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": q}
+                            obj2 = _for_annotation(it2, emitted)
+                            obj2.update(annot2)
                             if args.filter_characters:
                                 is_char2 = obj2.get("isCharacter") is True
                                 if not is_char2 and args.characters_relaxed:
@@ -3695,6 +3990,7 @@ def main():
                 extra_items: list[dict] = []
                 if getattr(args, "expand_boards", False) and "boards" in lists:
                     boards = lists.get("boards", [])[: max(int(getattr(args, "boards_max", 0)), 0)]
+                    bnames: list[str] = []
                     for b in boards:
                         if not isinstance(b, dict):
                             continue
@@ -3705,7 +4001,9 @@ def main():
                                 bname = v; break
                         if not bname:
                             continue
-                        extra_items.extend(await _expand_by_term(bname, "board"))
+                        bnames.append(bname)
+                    for found in await asyncio.gather(*(_expand_by_term(bn, "board") for bn in bnames)):
+                        extra_items.extend(found)
                 if getattr(args, "chase_hints", False) and isinstance(payload, dict):
                     raw_hints = []
                     for hk in ("hint", "hints", "suggestions", "suggested", "suggestedKeywords", "suggested_terms"):
@@ -3723,27 +4021,23 @@ def main():
                                         nv = x.get(nk)
                                         if isinstance(nv, str):
                                             raw_hints.append(nv); break
-                    seen_h = set()
-                    hints = []
-                    for h in raw_hints:
-                        if not isinstance(h, str):
-                            continue
-                        hh = h.strip()
-                        if not hh or hh == q or hh in seen_h:
-                            continue
-                        seen_h.add(hh)
-                        hints.append(hh)
+                    stripped = (h.strip() for h in raw_hints if isinstance(h, str))
+                    hints = list(dict.fromkeys(hh for hh in stripped if hh and hh != q))
                     hints = hints[: max(int(getattr(args, "hints_max", 0)), 0)]
-                    for h in hints:
-                        extra_items.extend(await _expand_by_term(h, "hint"))
+                    for found in await asyncio.gather(*(_expand_by_term(h, "hint") for h in hints)):
+                        extra_items.extend(found)
                 batch: list[dict] = []
+                # Annotate payload dicts in place; only copy when the same dict was already
+                # emitted under another list (recommendProfiles is merged into profiles).
+                emitted: set[int] = set()
                 for key in sorted(selected_keys):
                     items = lists.get(key, [])
-                    src_name = f"v2_search_top:{key}"
+                    annot = {"_source": f"v2_search_top:{key}", "_keyword": q}
                     for it in items:
                         if not isinstance(it, dict):
                             continue
-                        obj = {**it, "_source": src_name, "_keyword": q}
+                        obj = _for_annotation(it, emitted)
+                        obj.update(annot)
                         if args.filter_characters:
                             is_char = obj.get("isCharacter") is True
                             if not is_char and args.characters_relaxed:
@@ -3767,11 +4061,11 @@ def main():
                     print(f"query='{q}' page={pages+1} items={len(batch)}{tail}")
                     if names:
                         print(f"  {names}")
-                new = upd = 0
+                new = 0
                 if not args.dry_run and batch:
-                    n, u = store.upsert_raw(batch)
-                    new += n; upd += u
-                    total_new += n; total_updated += u
+                    # Buffered; the parquet rewrite runs on a worker thread so the prefetch keeps going
+                    new = _count_new(batch, known)
+                    await flusher.add(batch)
                 if new == 0:
                     no_prog += 1
                 else:
@@ -3784,51 +4078,27 @@ def main():
                     if pages >= args.pages:
                         break
                 cursor = next_cur
-            if args.auto_embed or args.auto_index:
-                try:
-                    cmd_embed()
-                except Exception as e:
-                    print(f"Auto-embed failed: {e}")
-            if args.auto_index:
-                try:
-                    import faiss  # type: ignore
-                    import numpy as _np
-                    st2 = PdbStorage()
-                    df2 = st2.load_joined()
-                    rows = df2.dropna(subset=["vector"]).reset_index(drop=True)
-                    if rows.empty:
-                        print("No vectors found; run embed first.")
-                    else:
-                        mat = _np.vstack(rows["vector"].to_list()).astype("float32")
-                        norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-                        mat = mat / norms
-                        index = faiss.IndexFlatIP(mat.shape[1])
-                        index.add(mat)
-                        outp = _Path(args.index_out)
-                        outp.parent.mkdir(parents=True, exist_ok=True)
-                        faiss.write_index(index, str(outp))
-                        (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(rows["cid"].astype(str).tolist()), encoding="utf-8")
-                        print(f"Indexed {len(rows)} vectors to {outp}")
-                except Exception as e:
-                    print(f"Auto-index failed: {e}")
-        asyncio.run(_run())
+            if next_task is not None and not next_task.done():
+                next_task.cancel()
+            await flusher.flush()
+            if not args.dry_run:
+                print(f"Done. New: {flusher.new} Updated: {flusher.updated}")
+            _auto_embed_and_index(args, store)
+        _run_async(_run())
         return
     elif args.cmd == "follow-hot":
         from pathlib import Path as _Path
-        def _pick_name(obj: dict) -> str:
-            for k in ("name", "title", "display_name", "username", "subcategory"):
-                v = obj.get(k)
-                if isinstance(v, str) and v:
-                    return v
-            return "(unknown)"
         async def _run():
-            client = _make_client(args)
-            store = PdbStorage()
+            # One client (and connection pool) for the hot-queries fetch and every key's pages
+            async with _make_client(args) as client:
+                await _follow(client)
+        async def _follow(client: PdbClient):
+            store = _store()
             try:
                 hq = await client.fetch_json("search/hot_queries")
             except Exception as e:
                 print(f"fetch hot-queries failed: {e}")
-                return
+                hq = None
             payload = hq.get("data") if isinstance(hq, dict) else hq
             keys: list[str] = []
             if isinstance(payload, dict):
@@ -3840,26 +4110,40 @@ def main():
                             keys.append(k)
                     elif isinstance(it, str):
                         keys.append(it)
+            if not keys:
+                # Fall back to the keys saved by the last hot-queries ingest
+                keys_path = store.raw_path.parent / "hot_query_keys.parquet"
+                if keys_path.exists():
+                    try:
+                        import pandas as pd
+                        keys = [k for k in pd.read_parquet(keys_path)["key"].tolist() if isinstance(k, str) and k]
+                        print(f"Using {len(keys)} stored hot query keys from {keys_path}")
+                    except Exception as e:
+                        print(f"Could not read {keys_path}: {e}")
             if not keys:
                 print("No hot query keys found.")
                 return
-            keys = keys[: max(int(args.max_keys), 0)]
+            # Hot-query lists can repeat a keyword; page each one only once
+            keys = list(dict.fromkeys(keys))[: max(int(args.max_keys), 0)]
             target_lists: Optional[set[str]] = None
             if args.only_profiles:
                 target_lists = {"profiles"}
             elif isinstance(args.lists, str) and args.lists:
                 target_lists = {s.strip() for s in args.lists.split(",") if s.strip()}
-            total_new = total_updated = 0
+            flusher = _Flusher(store, getattr(args, "upsert_batch", 2000))
             for keyw in keys:
                 cursor = args.next_cursor
                 no_prog = 0
                 pages = 0
-                while True:
+                def _page_params(cur, keyw=keyw) -> dict:
                     params = {"limit": args.limit, "keyword": keyw}
-                    if cursor:
-                        params["nextCursor"] = cursor
+                    if cur:
+                        params["nextCursor"] = cur
+                    return params
+                next_task: Optional[asyncio.Task] = asyncio.create_task(client.fetch_json("search/top", _page_params(cursor)))
+                while True:
                     try:
-                        data = await client.fetch_json("search/top", params)
+                        data = await next_task
                     except Exception as e:
                         print(f"search/top failed for key='{keyw}': {e}")
                         break
@@ -3871,6 +4155,10 @@ def main():
                             v = payload.get(kc)
                             if isinstance(v, int): next_cur = v; break
                             if isinstance(v, str) and v.isdigit(): next_cur = int(v); break
+                    # Prefetch the next page of this key while the current one is processed
+                    next_task = None
+                    if args.until_empty or pages + 1 < args.pages:
+                        next_task = asyncio.create_task(client.fetch_json("search/top", _page_params(next_cur)))
                     lists: dict[str, list] = {}
                     if isinstance(payload, dict):
                         for k, v in payload.items():
@@ -3882,32 +4170,22 @@ def main():
                             if recs:
                                 base = lists.get("profiles") or []
                                 lists["profiles"] = (base + recs)
-                    selected_keys = set(lists.keys()) if target_lists is None else (set(lists.keys()) & set(target_lists))
+                    selected_keys = set(lists) if target_lists is None else (lists.keys() & target_lists)
                     expanded_profiles: list[dict] = []
                     if args.expand_subcategories and "subcategories" in lists:
                         subcats = lists.get("subcategories", [])[: max(int(args.expand_max), 0)]
+                        sids: list[int] = []
                         for sc in subcats:
-                            sid = None
-                            if isinstance(sc, dict):
-                                for kk in ("id", "profileId", "profile_id", "profileID"):
-                                    vv = sc.get(kk)
-                                    if isinstance(vv, int): sid = vv; break
-                                    if isinstance(vv, str) and vv.isdigit(): sid = int(vv); break
-                            if not isinstance(sid, int):
-                                continue
-                            try:
-                                rel = await client.fetch_json(f"profiles/{sid}/related")
-                            except Exception:
-                                rel = None
-                            rel_payload = rel.get("data") if isinstance(rel, dict) else rel
-                            rel_list = []
-                            if isinstance(rel_payload, dict):
-                                rel_list = rel_payload.get("relatedProfiles") or rel_payload.get("profiles") or []
-                            if not isinstance(rel_list, list):
-                                continue
+                            sid = _get_pid(sc) if isinstance(sc, dict) else None
+                            if isinstance(sid, int):
+                                sids.append(sid)
+                        annot = {"_source": "v2_related_from_subcategory", "_keyword": keyw}
+                        for rel_list in await _fetch_related_lists(client, sids):
                             for it in rel_list:
                                 if isinstance(it, dict):
-                                    expanded_profiles.append({**it, "_source": "v2_related_from_subcategory", "_keyword": keyw, "_from_character_group": True if args.force_character_group else it.get("_from_character_group") or False})
+                                    it.update(annot)
+                                    it["_from_character_group"] = True if args.force_character_group else it.get("_from_character_group") or False
+                                    expanded_profiles.append(it)
                     # Optional: expand via boards and chase payload hints
                     async def _expand_by_term(term: str, tag: str) -> list[dict]:
                         try:
@@ -3929,11 +4207,14 @@ def main():
                                     base2 = lists2.get("profiles") or []
                                     lists2["profiles"] = (base2 + recs2)
                         out: list[dict] = []
+                        emitted: set[int] = set()
                         for ksel in sorted(selected_keys):
+                            annot2 = {"_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": keyw}
                             for it2 in lists2.get(ksel, []) or []:
                                 if not isinstance(it2, dict):
                                     continue
-                                obj2 = {**it2, "_source": f"v2_search_top_by_{tag}:{ksel}", "_keyword": keyw}
+                                obj2 = _for_annotation(it2, emitted)
+                                obj2.update(annot2)
                                 if args.filter_characters:
                                     is_char2 = obj2.get("isCharacter") is True
                                     if not is_char2 and args.characters_relaxed:
@@ -3945,6 +4226,7 @@ def main():
                     extra_items: list[dict] = []
                     if getattr(args, "expand_boards", False) and "boards" in lists:
                         boards = lists.get("boards", [])[: max(int(getattr(args, "boards_max", 0)), 0)]
+                        bnames: list[str] = []
                         for b in boards:
                             if not isinstance(b, dict):
                                 continue
@@ -3955,7 +4237,9 @@ def main():
                                     bname = v; break
                             if not bname:
                                 continue
-                            extra_items.extend(await _expand_by_term(bname, "board"))
+                            bnames.append(bname)
+                        for found in await asyncio.gather(*(_expand_by_term(bn, "board") for bn in bnames)):
+                            extra_items.extend(found)
                     if getattr(args, "chase_hints", False) and isinstance(payload, dict):
                         raw_hints = []
                         for hk in ("hint", "hints", "suggestions", "suggested", "suggestedKeywords", "suggested_terms"):
@@ -3973,26 +4257,20 @@ def main():
                                             nv = x.get(nk)
                                             if isinstance(nv, str):
                                                 raw_hints.append(nv); break
-                        seen_h = set()
-                        hints = []
-                        for h in raw_hints:
-                            if not isinstance(h, str):
-                                continue
-                            hh = h.strip()
-                            if not hh or hh == keyw or hh in seen_h:
-                                continue
-                            seen_h.add(hh)
-                            hints.append(hh)
+                        stripped = (h.strip() for h in raw_hints if isinstance(h, str))
+                        hints = list(dict.fromkeys(hh for hh in stripped if hh and hh != keyw))
                         hints = hints[: max(int(getattr(args, "hints_max", 0)), 0)]
-                        for h in hints:
-                            extra_items.extend(await _expand_by_term(h, "hint"))
+                        for found in await asyncio.gather(*(_expand_by_term(h, "hint") for h in hints)):
+                            extra_items.extend(found)
                     batch: list[dict] = []
+                    emitted: set[int] = set()
                     for k in sorted(selected_keys):
                         items = lists.get(k, [])
-                        src_name = f"v2_search_top:{k}"
+                        annot = {"_source": f"v2_search_top:{k}", "_keyword": keyw}
                         for it in items:
                             if not isinstance(it, dict): continue
-                            obj = {**it, "_source": src_name, "_keyword": keyw}
+                            obj = _for_annotation(it, emitted)
+                            obj.update(annot)
                             if args.filter_characters:
                                 is_char = obj.get("isCharacter") is True
                                 if not is_char and args.characters_relaxed:
@@ -4017,8 +4295,7 @@ def main():
                         if names:
                             print(f"  {names}")
                     if not args.dry_run and batch:
-                        n, u = store.upsert_raw(batch)
-                        total_new += n; total_updated += u
+                        await flusher.add(batch)
                     if not batch:
                         no_prog += 1
                     else:
@@ -4031,47 +4308,34 @@ def main():
                         if pages >= args.pages:
                             break
                     cursor = next_cur
-            if args.auto_embed or args.auto_index:
-                try:
-                    cmd_embed()
-                except Exception as e:
-                    print(f"Auto-embed failed: {e}")
-            if args.auto_index:
-                try:
-                    import faiss  # type: ignore
-                    import numpy as _np
-                    st2 = PdbStorage()
-                    df2 = st2.load_joined()
-                    rows = df2.dropna(subset=["vector"]).reset_index(drop=True)
-                    if rows.empty:
-                        print("No vectors found; run embed first.")
-                    else:
-                        mat = _np.vstack(rows["vector"].to_list()).astype("float32")
-                        norms = _np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
-                        mat = mat / norms
-                        index = faiss.IndexFlatIP(mat.shape[1])
-                        index.add(mat)
-                        outp = _Path(args.index_out)
-                        outp.parent.mkdir(parents=True, exist_ok=True)
-                        faiss.write_index(index, str(outp))
-                        (outp.with_suffix(outp.suffix + ".cids")).write_text("\n".join(rows["cid"].astype(str).tolist()), encoding="utf-8")
-                        print(f"Indexed {len(rows)} vectors to {outp}")
-                except Exception as e:
-                    print(f"Auto-index failed: {e}")
-            print(f"Done. New: {total_new} Updated: {total_updated}")
-        asyncio.run(_run())
+                if next_task is not None and not next_task.done():
+                    next_task.cancel()
+            await flusher.flush()
+            _auto_embed_and_index(args, store)
+            print(f"Done. New: {flusher.new} Updated: {flusher.updated}")
+        _run_async(_run())
         return
     elif args.cmd == "analyze":
         res = analyze_kl(args.file, top_k=args.top, smoothing=args.smoothing)
         if res.empty:
             print("No results (check input file schema or data coverage).")
         else:
+            import sys as _sys
             if args.format == "csv":
-                print(res.to_csv(index=False))
+                res.to_csv(_sys.stdout, index=False)
             else:
-                # simple table
-                for _, r in res.iterrows():
-                    print(f"q={r['question']}	{r['type_a']} vs {r['type_b']}	jsd={r['jsd']:.4f}	kl_ab={r['kl_ab']:.4f}	kl_ba={r['kl_ba']:.4f}")
+                # simple table, rendered from column arrays and written in one call
+                q = res["question"].to_numpy()
+                a = res["type_a"].to_numpy()
+                b = res["type_b"].to_numpy()
+                jsd = res["jsd"].to_numpy()
+                ab = res["kl_ab"].to_numpy()
+                ba = res["kl_ba"].to_numpy()
+                lines = [
+                    f"q={q[i]}\t{a[i]} vs {b[i]}\tjsd={jsd[i]:.4f}\tkl_ab={ab[i]:.4f}\tkl_ba={ba[i]:.4f}"
+                    for i in range(len(res))
+                ]
+                _sys.stdout.write("\n".join(lines) + "\n")
     elif args.cmd == "export":
         import pandas as pd
         from pathlib import Path
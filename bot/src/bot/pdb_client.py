@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Any, AsyncIterator, Dict, Optional
 
 import httpx
+import orjson
 from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
 
@@ -26,6 +27,7 @@ class PdbClient:
     timeout_s: float = 20.0
     base_url: Optional[str] = None
     headers: Optional[Dict[str, str]] = None
+    http2: Optional[bool] = None
 
     def __post_init__(self) -> None:
         # Allow env to override defaults
@@ -44,6 +46,14 @@ class PdbClient:
         # Base URL can be passed or come from env; fallback to module default
         if not self.base_url:
             self.base_url = os.getenv("PDB_API_BASE_URL", BASE_URL)
+        if self.http2 is None:
+            self.http2 = os.getenv("PDB_HTTP2", "1").lower() in {"1", "true", "yes"}
+        if self.http2:
+            # httpx needs the optional 'h2' package for HTTP/2; fall back to HTTP/1.1
+            try:
+                import h2  # type: ignore  # noqa: F401
+            except Exception:
+                self.http2 = False
         self._sem = asyncio.Semaphore(self.concurrency)
         self._interval = max(1.0 / max(self.rate_per_minute / 60.0, 1e-6), 0.0)
         self._last_call = 0.0
@@ -54,8 +64,7 @@ class PdbClient:
         hdrs_json = os.getenv("PDB_API_HEADERS")
         if hdrs_json:
             try:
-                import json as _json
-                extra.update(_json.loads(hdrs_json))
+                extra.update(orjson.loads(hdrs_json))
             except Exception:
                 pass
         # Merge explicit headers last to allow CLI/user override
@@ -71,15 +80,74 @@ class PdbClient:
         self._cache_dir = Path(cache_dir)
         if self._cache_enabled:
             self._cache_dir.mkdir(parents=True, exist_ok=True)
+        # Shared connection pool, created lazily inside the running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __aenter__(self) -> "PdbClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        # Keep _client_loop so a later use under another event loop still resets _sem
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # An AsyncClient is bound to the loop it was first used on; rebuild it when the
+        # same PdbClient is reused under a new asyncio.run()
+        if self._client is None or self._client_loop is not loop:
+            if self._client_loop is not None and self._client_loop is not loop:
+                # asyncio primitives bind to the loop that first waits on them
+                self._sem = asyncio.Semaphore(self.concurrency)
+            base_headers = {
+                "User-Agent": os.getenv(
+                    "PDB_DEFAULT_UA",
+                    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+                ),
+                "Accept": os.getenv(
+                    "PDB_DEFAULT_ACCEPT",
+                    "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+                ),
+                "Accept-Language": os.getenv("PDB_DEFAULT_ACCEPT_LANGUAGE", "en-US,en;q=0.9"),
+                # Many v2 endpoints respond more richly when these are present
+                "Origin": os.getenv("PDB_DEFAULT_ORIGIN", "https://www.personality-database.com"),
+                "Referer": os.getenv("PDB_DEFAULT_REFERER", "https://www.personality-database.com/"),
+            }
+            base_headers.update(self._extra_headers)
+            limits = httpx.Limits(
+                max_connections=max(self.concurrency, 1),
+                max_keepalive_connections=max(self.concurrency, 1),
+                # Throttled crawls can idle a connection for several seconds between requests
+                keepalive_expiry=60.0,
+            )
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_s,
+                headers=base_headers,
+                limits=limits,
+                http2=bool(self.http2),
+            )
+            self._client_loop = loop
+        return self._client
 
     async def _throttle(self) -> None:
         import time
 
+        # Reserve the next send slot before sleeping so concurrent callers queue up
+        # behind each other instead of all waking after the same delay
         now = time.time()
-        wait = self._interval - (now - self._last_call)
+        slot = max(now, self._last_call + self._interval)
+        self._last_call = slot
+        wait = slot - now
         if wait > 0:
             await asyncio.sleep(wait)
-        self._last_call = time.time()
 
     def _cache_key(self, url: str, params: Optional[Dict[str, Any]]) -> Path:
         hasher = hashlib.sha256()
@@ -100,115 +168,95 @@ class PdbClient:
             key = self._cache_key(url, params)
             if key.exists():
                 try:
-                    txt = key.read_text(encoding="utf-8")
-                    import json as _json
-                    return _json.loads(txt)
+                    return orjson.loads(key.read_bytes())
                 except Exception:
                     pass
+        client = self._http()
         async with self._sem:
             await self._throttle()
-            base_headers = {
-                "User-Agent": os.getenv(
-                    "PDB_DEFAULT_UA",
-                    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-                ),
-                "Accept": os.getenv(
-                    "PDB_DEFAULT_ACCEPT",
-                    "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-                ),
-                "Accept-Language": os.getenv("PDB_DEFAULT_ACCEPT_LANGUAGE", "en-US,en;q=0.9"),
-                # Many v2 endpoints respond more richly when these are present
-                "Origin": os.getenv("PDB_DEFAULT_ORIGIN", "https://www.personality-database.com"),
-                "Referer": os.getenv("PDB_DEFAULT_REFERER", "https://www.personality-database.com/"),
-            }
-            base_headers.update(self._extra_headers)
-            async with httpx.AsyncClient(timeout=self.timeout_s, headers=base_headers) as client:
-                async for attempt in AsyncRetrying(
-                    reraise=True,
-                    stop=stop_after_attempt(5),
-                    wait=wait_exponential_jitter(initial=0.5, max=10),
-                    retry=retry_if_exception_type((httpx.HTTPError, RateLimitError)),
-                ):
-                    with attempt:
-                        resp = await client.get(url, params=params)
-                        if resp.status_code == 429:
-                            raise RateLimitError("rate limited")
-                        resp.raise_for_status()
-                        enc = (resp.headers.get("content-encoding") or "").lower()
-                        ctype = (resp.headers.get("content-type") or "").lower()
-                        body = resp.content
-                        # Try direct parse first when JSON content-type
-                        if "application/json" in ctype:
-                            try:
-                                import orjson as _orjson  # type: ignore
-                                data = _orjson.loads(body)
-                                if self._cache_enabled:
-                                    pass
-                                return data
-                            except Exception:
+            async for attempt in AsyncRetrying(
+                reraise=True,
+                stop=stop_after_attempt(5),
+                wait=wait_exponential_jitter(initial=0.5, max=10),
+                retry=retry_if_exception_type((httpx.HTTPError, RateLimitError)),
+            ):
+                with attempt:
+                    resp = await client.get(url, params=params)
+                    if resp.status_code == 429:
+                        raise RateLimitError("rate limited")
+                    resp.raise_for_status()
+                    enc = (resp.headers.get("content-encoding") or "").lower()
+                    ctype = (resp.headers.get("content-type") or "").lower()
+                    body = resp.content
+                    # Try direct parse first when JSON content-type
+                    if "application/json" in ctype:
+                        try:
+                            data = orjson.loads(body)
+                            if self._cache_enabled:
                                 pass
-                        # Detect encoders by header or magic bytes
-                        def _try_parse(b: bytes):
-                            try:
-                                import orjson as _orjson  # type: ignore
-                                return _orjson.loads(b)
-                            except Exception:
-                                import json as _json
-                                return _json.loads(b.decode("utf-8"))
+                            return data
+                        except Exception:
+                            pass
+                    # Detect encoders by header or magic bytes
+                    def _try_parse(b: bytes):
+                        try:
+                            return orjson.loads(b)
+                        except Exception:
+                            import json as _json
+                            return _json.loads(b.decode("utf-8"))
 
+                    parsed = None
+                    # zstd
+                    try:
+                        is_zstd = ("zstd" in enc or "zst" in enc) or (
+                            len(body) >= 4 and body[0] == 0x28 and body[1] == 0xB5 and body[2] == 0x2F and body[3] == 0xFD
+                        )
+                        if is_zstd:
+                            import zstandard as zstd  # type: ignore
+                            dctx = zstd.ZstdDecompressor()
+                            raw = dctx.decompress(body)
+                            parsed = _try_parse(raw)
+                    except Exception:
                         parsed = None
-                        # zstd
+                    # brotli
+                    if parsed is None:
                         try:
-                            is_zstd = ("zstd" in enc or "zst" in enc) or (
-                                len(body) >= 4 and body[0] == 0x28 and body[1] == 0xB5 and body[2] == 0x2F and body[3] == 0xFD
-                            )
-                            if is_zstd:
-                                import zstandard as zstd  # type: ignore
-                                dctx = zstd.ZstdDecompressor()
-                                raw = dctx.decompress(body)
+                            if "br" in enc:
+                                import brotli  # type: ignore
+                                raw = brotli.decompress(body)
                                 parsed = _try_parse(raw)
                         except Exception:
                             parsed = None
-                        # brotli
-                        if parsed is None:
-                            try:
-                                if "br" in enc:
-                                    import brotli  # type: ignore
-                                    raw = brotli.decompress(body)
-                                    parsed = _try_parse(raw)
-                            except Exception:
-                                parsed = None
-                        # gzip
-                        if parsed is None:
-                            try:
-                                if "gzip" in enc or (len(body) >= 2 and body[0] == 0x1F and body[1] == 0x8B):
-                                    import gzip as _gzip
-                                    raw = _gzip.decompress(body)
-                                    parsed = _try_parse(raw)
-                            except Exception:
-                                parsed = None
-                        # deflate (zlib)
-                        if parsed is None:
-                            try:
-                                if "deflate" in enc:
-                                    import zlib as _zlib
-                                    raw = _zlib.decompress(body)
-                                    parsed = _try_parse(raw)
-                            except Exception:
-                                parsed = None
-                        if parsed is not None:
-                            data = parsed
-                        else:
-                            # Last resort
-                            data = resp.json()
-                        if self._cache_enabled:
-                            try:
-                                import json as _json
-                                key = self._cache_key(url, params)
-                                key.write_text(_json.dumps(data), encoding="utf-8")
-                            except Exception:
-                                pass
-                        return data
+                    # gzip
+                    if parsed is None:
+                        try:
+                            if "gzip" in enc or (len(body) >= 2 and body[0] == 0x1F and body[1] == 0x8B):
+                                import gzip as _gzip
+                                raw = _gzip.decompress(body)
+                                parsed = _try_parse(raw)
+                        except Exception:
+                            parsed = None
+                    # deflate (zlib)
+                    if parsed is None:
+                        try:
+                            if "deflate" in enc:
+                                import zlib as _zlib
+                                raw = _zlib.decompress(body)
+                                parsed = _try_parse(raw)
+                        except Exception:
+                            parsed = None
+                    if parsed is not None:
+                        data = parsed
+                    else:
+                        # Last resort
+                        data = resp.json()
+                    if self._cache_enabled:
+                        try:
+                            key = self._cache_key(url, params)
+                            key.write_bytes(orjson.dumps(data))
+                        except Exception:
+                            pass
+                    return data
 
     async def fetch_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
         return await self._get(path, params)
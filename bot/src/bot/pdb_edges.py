@@ -33,9 +33,9 @@ class PdbEdgesStorage:
         df = _load_parquet(self.edges_path, ["from_pid", "to_pid", "relation", "source"])
         existing_keys = set()
         if not df.empty:
-            for _, row in df.iterrows():
+            for a, b, rel in df.reindex(columns=["from_pid", "to_pid", "relation"]).itertuples(index=False, name=None):
                 try:
-                    existing_keys.add((int(row.get("from_pid")), int(row.get("to_pid")), str(row.get("relation") or "")))
+                    existing_keys.add((int(a), int(b), str(rel or "")))
                 except Exception:
                     pass
         rows = []
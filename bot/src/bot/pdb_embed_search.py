@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import hashlib
 import os
 from typing import Iterable, List, Tuple
@@ -7,38 +8,108 @@ from typing import Iterable, List, Tuple
 import numpy as np
 
 
+class _LiteEmbedder:
+    """Token-hash embedder used when SOCIONICS_LIGHTWEIGHT_EMBEDDINGS is on."""
+
+    def encode(self, text: str):
+        buckets = [0.0] * 64
+        for tok in (text or "").split():
+            h = int(hashlib.sha256(tok.lower().encode()).hexdigest(), 16)
+            buckets[h % 64] += 1
+        norm = float(np.linalg.norm(buckets)) or 1.0
+        return np.array([v / norm for v in buckets], dtype=float)
+
+
 def _get_embedder():
     light = os.getenv("SOCIONICS_LIGHTWEIGHT_EMBEDDINGS", "1").lower() in ("1", "true", "yes")
+    model_name = os.getenv("SOCIONICS_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    return _load_embedder(light, model_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_embedder(light: bool, model_name: str):
+    # Cached per config: loading a sentence-transformers model takes seconds and
+    # callers embed in many small batches
     if light:
-        class _Lite:
-            def encode(self, text: str):
-                buckets = [0.0] * 64
-                for tok in (text or "").split():
-                    h = int(hashlib.sha256(tok.lower().encode()).hexdigest(), 16)
-                    buckets[h % 64] += 1
-                norm = float(np.linalg.norm(buckets)) or 1.0
-                return np.array([v / norm for v in buckets], dtype=float)
-        return _Lite()
-    else:
-        from sentence_transformers import SentenceTransformer
-
-        model_name = os.getenv("SOCIONICS_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        return SentenceTransformer(model_name)
-
-
-def embed_texts(texts: Iterable[str]) -> List[List[float]]:
+        return _LiteEmbedder()
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def embed_texts(texts: Iterable[str], batch_size: int = 256) -> List[List[float]]:
     model = _get_embedder()
     vecs: List[List[float]] = []
-    for t in texts:
-        v = model.encode(t)
-        if hasattr(v, "tolist"):
-            v = v.tolist()
-        vecs.append(v)
+    if isinstance(model, _LiteEmbedder):
+        for t in texts:
+            vecs.append(model.encode(t).tolist())
+        return vecs
+    # Models encode a list in padded batches, far faster than one call per text
+    texts = list(texts)
+    step = max(int(batch_size or 1), 1)
+    for i in range(0, len(texts), step):
+        out = model.encode(texts[i : i + step], batch_size=step)
+        vecs.extend(out.tolist() if hasattr(out, "tolist") else [list(v) for v in out])
     return vecs
 
 
+@functools.lru_cache(maxsize=None)
+def _numba_cosine():
+    """Compile the parallel row-cosine kernel once, or None when numba is missing."""
+    try:
+        from numba import njit, prange  # type: ignore
+    except Exception:
+        return None
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _kernel(mat, q):
+        n, d = mat.shape
+        qn = np.sqrt(np.dot(q, q)) + 1e-9
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            dot = 0.0
+            nrm = 0.0
+            for j in range(d):
+                v = mat[i, j]
+                dot += v * q[j]
+                nrm += v * v
+            out[i] = dot / (np.sqrt(nrm) * qn + 1e-9)
+        return out
+
+    return _kernel
+
+
+def _cosine_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    # SimSIMD (optional) computes the distances in one fused SIMD pass; otherwise a
+    # numba kernel (optional) does norms and dots in one pass per row; else numpy
+    mat32 = np.ascontiguousarray(matrix, dtype=np.float32)
+    q32 = np.ascontiguousarray(query, dtype=np.float32).ravel()
+    try:
+        import simsimd  # type: ignore
+
+        return 1.0 - np.asarray(simsimd.cdist(q32.reshape(1, -1), mat32, metric="cosine")).ravel()
+    except Exception:
+        pass
+    kernel = _numba_cosine()
+    if kernel is not None:
+        try:
+            return kernel(mat32, q32)
+        except Exception:
+            pass
+    # einsum gives the row norms in one pass without an N x d squared temporary
+    row_norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+    denom = (row_norms * (np.sqrt(np.vdot(query, query)) + 1e-9)) + 1e-9
+    return (matrix @ query) / denom
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first: an O(N) partition, then a sort of k."""
+    k = max(min(int(k), len(scores)), 0)
+    idx = np.argpartition(-scores, k - 1)[:k] if 0 < k < len(scores) else np.arange(k)
+    return idx[np.argsort(-scores[idx])]
+
+
 def cosine_topk(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
-    denom = (np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) + 1e-9)) + 1e-9
-    scores = (matrix @ query) / denom
-    idx = np.argsort(-scores)[:k]
+    scores = _cosine_scores(matrix, query)
+    idx = top_k_indices(scores, k)
     return idx, scores[idx]
@@ -2,18 +2,29 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
 
+import orjson
 import pandas as pd
 import os
 import time
 import fcntl
+import threading
 
-from .pdb_cid import cid_from_object, canonical_json_bytes
+from .pdb_cid import cid_from_bytes, canonical_json_bytes
 
 
 RAW_PARQUET = "pdb_profiles.parquet"
 VEC_PARQUET = "pdb_profile_vectors.parquet"
+# Sidecar of fields decoded from raw payloads; rebuilt whenever the raw parquet is newer
+DECODED_PARQUET = "pdb_profiles_decoded.parquet"
+# L2-normalized float32 vector matrix (+ .cids), memory-mapped by searches while fresh
+VEC_MATRIX_NPY = "pdb_profile_vectors.f32.npy"
+
+_PID_KEYS = ("id", "profileId", "profileID", "profile_id", "_profile_id")
+_NAME_KEYS = ("name", "title", "display_name", "username", "subcategory")
+# ids-by-name's stricter id rule: API keys only (no _profile_id), digit-only strings
+_API_PID_KEYS = ("id", "profileId", "profile_id", "profileID")
 
 
 def _ensure_dir() -> Path:
@@ -42,13 +53,19 @@ def _load_parquet(path: Path, columns: List[str]) -> pd.DataFrame:
         return pd.DataFrame(columns=columns)
 
 
-def _atomic_write_parquet(df: pd.DataFrame, path: Path) -> None:
+def _atomic_write_parquet(df: pd.DataFrame, path: Path, schema: Any = None) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     # Use a unique tmp filename in the same directory for atomic replace
     ts = int(time.time() * 1000)
     tmp = path.with_suffix(path.suffix + f".tmp.{os.getpid()}.{ts}")
     try:
-        df.to_parquet(tmp, index=False)
+        # Write through pyarrow directly with zstd: smaller files and faster decode
+        # than pandas' default snappy for the JSON-heavy payload column
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        pq.write_table(table, tmp, compression="zstd")
         os.replace(tmp, path)
     finally:
         try:
@@ -58,14 +75,43 @@ def _atomic_write_parquet(df: pd.DataFrame, path: Path) -> None:
             pass
 
 
+_THREAD_LOCKS: dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _thread_lock(lock_path: Path) -> threading.Lock:
+    key = str(lock_path)
+    with _THREAD_LOCKS_GUARD:
+        lk = _THREAD_LOCKS.get(key)
+        if lk is None:
+            lk = _THREAD_LOCKS[key] = threading.Lock()
+        return lk
+
+
 class _FileLock:
+    """Exclusive lock across processes (flock) and threads of this process.
+
+    Upserts are dispatched to worker threads via asyncio.to_thread, so the
+    in-process lock is taken first to serialize them without relying on
+    per-descriptor flock semantics.
+    """
+
     def __init__(self, lock_path: Path) -> None:
         self._lock_path = lock_path
         self._fh = None
+        self._tlock = _thread_lock(lock_path)
 
     def __enter__(self):
-        self._fh = open(self._lock_path, "w")
-        fcntl.flock(self._fh, fcntl.LOCK_EX)
+        self._tlock.acquire()
+        try:
+            self._fh = open(self._lock_path, "w")
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        except BaseException:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._tlock.release()
+            raise
         return self
 
     def __exit__(self, exc_type, exc, tb):
@@ -75,6 +121,98 @@ class _FileLock:
                 self._fh.close()
         finally:
             self._fh = None
+            self._tlock.release()
+
+
+def _content_bytes(r: Any) -> bytes:
+    """Canonical bytes a record's CID is computed from: ephemeral provenance keys
+    (those starting with '_') are dropped first."""
+    base_obj = r
+    if isinstance(r, dict):
+        try:
+            base_obj = {k: v for k, v in r.items() if not (isinstance(k, str) and k.startswith("_"))}
+        except Exception:
+            base_obj = r
+    return canonical_json_bytes(base_obj)
+
+
+def _as_int64(v: Any) -> Optional[int]:
+    try:
+        i = v if isinstance(v, int) else int(v) if isinstance(v, str) else None
+    except Exception:
+        return None
+    if i is None or not (-(2**63) <= i < 2**63):
+        return None
+    return i
+
+
+def _decoded_fields(
+    pb: Any,
+    _loads=orjson.loads,
+    _errors=orjson.JSONDecodeError,
+    _pid_keys=_PID_KEYS,
+    _api_pid_keys=_API_PID_KEYS,
+    _name_keys=_NAME_KEYS,
+    _as_int=_as_int64,
+    _dict=dict,
+    _int=int,
+    _str=str,
+) -> Tuple[Optional[int], Optional[str], Optional[str], Optional[int], Optional[int]]:
+    """Return (pid, name, _source, _profile_id, api_pid) for one raw payload.
+
+    Module-level so the sidecar rebuild can run it in a process pool. Runs once per
+    stored row, so globals and builtins are bound as defaults (fast local lookups).
+    """
+    try:
+        obj = _loads(pb)
+    except _errors:
+        # In-memory records (sidecar patches from upsert_raw) arrive already decoded;
+        # orjson rejects a dict argument with JSONDecodeError, not TypeError
+        if type(pb) is not _dict:
+            return None, None, None, None, None
+        obj = pb
+    if type(obj) is not _dict:
+        return None, None, None, None, None
+    get = obj.get
+    pid = None
+    for k in _pid_keys:
+        v = get(k)
+        t = type(v)
+        if t is _int or t is _str:
+            pid = _as_int(v)
+            if pid is not None:
+                break
+    api_pid = None
+    for k in _api_pid_keys:
+        v = get(k)
+        t = type(v)
+        if t is _int or (t is _str and v.isdigit()):
+            api_pid = _as_int(v)
+            break
+    name = None
+    for k in _name_keys:
+        v = get(k)
+        if type(v) is _str and v:
+            name = v
+            break
+    src = get("_source")
+    if type(src) is not _str:
+        src = None
+    return pid, name, src, _as_int(get("_profile_id")), api_pid
+
+
+def _decoded_table(cids: List[str], fields: List[Tuple[Any, Any, Any, Any, Any]]):
+    import pyarrow as pa
+
+    pids, names, sources, v1_ids, api_pids = zip(*fields) if fields else ((), (), (), (), ())
+    return pa.table({
+        "cid": pa.array(cids, type=pa.string()),
+        "pid": pa.array(pids, type=pa.int64()),
+        "name": pa.array(names, type=pa.string()),
+        "_source": pa.array(sources, type=pa.string()),
+        "_profile_id": pa.array(v1_ids, type=pa.int64()),
+        "api_pid": pa.array(api_pids, type=pa.int64()),
+    })
 
 
 @dataclass
@@ -83,81 +221,205 @@ class PdbStorage:
         base = _ensure_dir()
         self.raw_path = base / RAW_PARQUET
         self.vec_path = base / VEC_PARQUET
+        self.decoded_path = base / DECODED_PARQUET
+        self.vec_matrix_path = base / VEC_MATRIX_NPY
+
+    def load_decoded(self, columns: Optional[Sequence[str]] = None, filter: Any = None):
+        """Arrow table of decoded payload fields: cid, pid, name, _source, _profile_id, api_pid.
+
+        Served from the decoded sidecar when it is at least as new as the raw parquet;
+        otherwise rebuilt with one streaming decode pass and rewritten (zstd).
+        ``filter`` is a pyarrow.dataset expression, pushed down into the parquet read.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cols = list(columns) if columns else None
+        if not self.raw_path.exists():
+            names = cols or ["cid", "pid", "name", "_source", "_profile_id", "api_pid"]
+            return pa.table({c: pa.array([], type=pa.int64() if c in ("pid", "_profile_id", "api_pid") else pa.string()) for c in names})
+        try:
+            if self._decoded_is_fresh():
+                return pq.read_table(self.decoded_path, columns=cols, filters=filter, memory_map=True)
+        except Exception:
+            pass
+        # Stamp the sidecar with the raw file's mtime as seen before decoding, so a raw
+        # rewrite that lands mid-rebuild leaves the sidecar stale rather than "fresh"
+        raw_mtime_ns = self.raw_path.stat().st_mtime_ns
+        cids: list = []
+        fields: list = []
+        # Memory-map the raw file: pages come from the kernel cache on demand and only the
+        # decoded batch of the two projected columns is held in process memory
+        pf = pq.ParquetFile(self.raw_path, memory_map=True)
+        # Decoding is pure CPU; fan it out over processes for large stores
+        workers = os.cpu_count() or 1
+        pool = None
+        if workers > 1 and pf.metadata.num_rows >= 100_000:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            for rb in pf.iter_batches(batch_size=65536, columns=["cid", "payload_bytes"]):
+                payloads = rb.column(1).to_pylist()
+                if pool is not None:
+                    fields.extend(pool.map(_decoded_fields, payloads, chunksize=1000))
+                else:
+                    fields.extend(map(_decoded_fields, payloads))
+                cids.extend(str(c) for c in rb.column(0).to_pylist())
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        table = _decoded_table(cids, fields)
+        self._write_decoded(table, raw_mtime_ns)
+        if filter is not None:
+            table = table.filter(filter)
+        return table.select(cols) if cols else table
+
+    def _write_decoded(self, table, raw_mtime_ns: int) -> None:
+        import pyarrow.parquet as pq
+
+        tmp = self.decoded_path.with_suffix(self.decoded_path.suffix + f".tmp.{os.getpid()}.{int(time.time() * 1000)}")
+        try:
+            pq.write_table(table, tmp, compression="zstd")
+            os.utime(tmp, ns=(raw_mtime_ns, raw_mtime_ns))
+            os.replace(tmp, self.decoded_path)
+        except Exception:
+            pass
+        finally:
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            except Exception:
+                pass
+
+    def _decoded_is_fresh(self) -> bool:
+        try:
+            return self.decoded_path.stat().st_mtime >= self.raw_path.stat().st_mtime
+        except Exception:
+            return False
+
+    def _patch_decoded(self, changed: dict[str, dict]) -> None:
+        """Replace/append the decoded rows for ``changed`` (cid -> record) in the sidecar.
+
+        Called right after a raw write while the sidecar was still fresh, so warm runs
+        never rescan the raw parquet. On any failure the sidecar is simply left stale
+        and load_decoded() rebuilds it.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            import pyarrow.parquet as pq
+
+            old = pq.read_table(self.decoded_path)
+            keep = pc.invert(pc.is_in(old.column("cid"), value_set=pa.array(list(changed), type=pa.string())))
+            add = _decoded_table(list(changed), [_decoded_fields(r) for r in changed.values()])
+            table = pa.concat_tables([old.filter(keep), add.cast(old.schema)])
+            self._write_decoded(table, self.raw_path.stat().st_mtime_ns)
+        except Exception:
+            pass
 
     def upsert_raw(self, records: Iterable[dict]) -> Tuple[int, int]:
         lock = self.raw_path.with_suffix(self.raw_path.suffix + ".lock")
         with _FileLock(lock):
             df = _load_parquet(self.raw_path, ["cid", "payload_bytes"])
-            existing = set(df["cid"].astype(str)) if not df.empty else set()
-            # Build a small lookup for existing payloads to avoid redundant writes
+            # One cid -> payload lookup serves both membership and the "unchanged" check;
+            # no separate set of every cid string is kept
             existing_payload: dict[str, bytes] = {}
             if not df.empty:
-                for _, row in df.iterrows():
-                    try:
-                        existing_payload[str(row.get("cid"))] = row.get("payload_bytes")
-                    except Exception:
-                        pass
-            rows = []
+                existing_payload = dict(zip(df["cid"].astype(str).tolist(), df["payload_bytes"].tolist()))
+            # cids first seen in this call -> index in rows, so repeats within a batch
+            # overwrite the pending row instead of appending a duplicate
+            pending: dict[str, int] = {}
+            rows: list[tuple[str, bytes]] = []
+            # cid -> record for every new or changed row, used to patch the decoded sidecar
+            changed: dict[str, dict] = {}
+            # cid -> new payload for stored rows whose content changed, applied in one pass
+            replaced: dict[str, bytes] = {}
             new = 0
             updated = 0
+            # Memoize CIDs by canonical content bytes: the same profile often arrives
+            # several times in one batch under different provenance keys
+            cid_memo: dict[bytes, str] = {}
             for r in records:
-                # Compute CID from content without ephemeral provenance keys (those starting with '_')
-                base_obj = r
-                if isinstance(r, dict):
-                    try:
-                        base_obj = {k: v for k, v in r.items() if not (isinstance(k, str) and k.startswith("_"))}
-                    except Exception:
-                        base_obj = r
-                cid = cid_from_object(base_obj)
+                # Compute CID from content without ephemeral provenance keys
+                canon = _content_bytes(r)
+                cid = cid_memo.get(canon)
+                if cid is None:
+                    cid = cid_memo[canon] = cid_from_bytes(canon)
                 # Store full annotated payload for analysis/debugging
                 payload = canonical_json_bytes(r)
                 scid = str(cid)
-                if scid in existing:
+                if scid in pending:
+                    rows[pending[scid]] = (scid, payload)
+                    changed[scid] = r
+                    continue
+                if scid in replaced:
+                    replaced[scid] = payload
+                    changed[scid] = r
+                    continue
+                if scid in existing_payload:
                     # Only write if payload actually differs
                     prev = existing_payload.get(scid)
                     if isinstance(prev, (bytes, bytearray)) and prev == payload:
                         continue
-                    df.loc[df.cid == scid, "payload_bytes"] = [payload]
+                    replaced[scid] = payload
+                    changed[scid] = r
                     updated += 1
                 else:
-                    rows.append({"cid": scid, "payload_bytes": payload})
+                    pending[scid] = len(rows)
+                    rows.append((scid, payload))
+                    changed[scid] = r
                     new += 1
+            if replaced:
+                # One vectorized assignment instead of a full-column scan per changed row
+                cid_str = df["cid"].astype(str)
+                mask = cid_str.isin(list(replaced))
+                df.loc[mask, "payload_bytes"] = cid_str[mask].map(replaced)
             if rows:
-                new_df = pd.DataFrame(rows)
+                new_df = pd.DataFrame.from_records(rows, columns=["cid", "payload_bytes"])
                 if df.empty:
                     df = new_df
                 else:
                     df = pd.concat([df, new_df], ignore_index=True, copy=False)
             if new or updated:
+                decoded_fresh = self._decoded_is_fresh()
                 _atomic_write_parquet(df, self.raw_path)
+                if decoded_fresh:
+                    self._patch_decoded(changed)
             return new, updated
 
     def upsert_vectors(self, items: Iterable[tuple[str, list[float]]]) -> Tuple[int, int]:
+        """Insert/replace vectors by cid. Vectors are stored as list<float32>."""
+        import numpy as np
+        import pyarrow as pa
+
         lock = self.vec_path.with_suffix(self.vec_path.suffix + ".lock")
         with _FileLock(lock):
             df = _load_parquet(self.vec_path, ["cid", "vector"])
-            existing = set(df["cid"].astype(str)) if not df.empty else set()
-            existing_vec: dict[str, list] = {}
+            # One cid -> vector lookup built from the column lists (no iterrows, no
+            # separate astype(str) copy of the cid column for membership)
+            existing_vec: dict[str, Any] = {}
             if not df.empty:
-                for _, row in df.iterrows():
-                    try:
-                        existing_vec[str(row.get("cid"))] = row.get("vector")
-                    except Exception:
-                        pass
+                existing_vec = dict(zip(map(str, df["cid"].tolist()), df["vector"].tolist()))
             rows = []
+            replaced: dict[str, Any] = {}
             new = 0
             updated = 0
             for cid, vec in items:
                 scid = str(cid)
-                if scid in existing:
-                    prev = existing_vec.get(scid)
-                    if isinstance(prev, list) and prev == vec:
+                vec = np.asarray(vec, dtype=np.float32)
+                if scid in existing_vec:
+                    prev = existing_vec[scid]
+                    if prev is not None and np.array_equal(np.asarray(prev, dtype=np.float32), vec):
                         continue
-                    df.loc[df.cid == scid, "vector"] = [vec]
+                    replaced[scid] = vec
+                    existing_vec[scid] = vec
                     updated += 1
                 else:
                     rows.append({"cid": scid, "vector": vec})
                     new += 1
+            if replaced:
+                # one pass over the column instead of a boolean .loc scan per update
+                df["vector"] = [replaced.get(c, v) for c, v in zip(map(str, df["cid"].tolist()), df["vector"].tolist())]
             if rows:
                 new_df = pd.DataFrame(rows)
                 if df.empty:
@@ -165,7 +427,9 @@ class PdbStorage:
                 else:
                     df = pd.concat([df, new_df], ignore_index=True, copy=False)
             if new or updated:
-                _atomic_write_parquet(df, self.vec_path)
+                # float32 on disk: half the bytes of float64, and readers need no cast
+                schema = pa.schema([("cid", pa.string()), ("vector", pa.list_(pa.float32()))])
+                _atomic_write_parquet(df[["cid", "vector"]], self.vec_path, schema)
             return new, updated
 
     def load_joined(self) -> pd.DataFrame:
@@ -174,3 +438,73 @@ class PdbStorage:
         if raw.empty:
             return pd.DataFrame(columns=["cid", "payload_bytes", "vector"])
         return raw.merge(vec, on="cid", how="left")
+
+    def load_vector_matrix(self) -> Tuple[List[str], Any]:
+        """(cids, matrix) for every stored vector whose cid is in the raw parquet.
+
+        The matrix is float32 with L2-normalized rows. It is memory-mapped from
+        VEC_MATRIX_NPY while that cache is at least as new as both parquet files;
+        otherwise it is rebuilt from the Arrow vector column (flat value buffer reshaped
+        to (n, d), no per-row stacking) and the cache rewritten. Rows whose length
+        differs from the most common dimension are dropped. The matrix is read-only;
+        copy before modifying in place.
+        """
+        import numpy as np
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        if not self.vec_path.exists() or not self.raw_path.exists():
+            return [], np.empty((0, 0), dtype=np.float32)
+        cids_path = self.vec_matrix_path.with_suffix(".cids")
+        try:
+            stamp = self.vec_matrix_path.stat().st_mtime
+            if stamp >= self.vec_path.stat().st_mtime and stamp >= self.raw_path.stat().st_mtime:
+                mat = np.load(self.vec_matrix_path, mmap_mode="r")
+                cids = cids_path.read_text(encoding="utf-8").splitlines() if mat.shape[0] else []
+                if len(cids) == mat.shape[0]:
+                    return cids, mat
+        except Exception:
+            pass
+        # Stamp the cache with the sources' mtime as seen before reading them
+        src_mtime_ns = max(self.vec_path.stat().st_mtime_ns, self.raw_path.stat().st_mtime_ns)
+        vec = pq.read_table(self.vec_path, columns=["cid", "vector"], memory_map=True)
+        raw_cids = pq.read_table(self.raw_path, columns=["cid"], memory_map=True).column("cid")
+        vec = vec.filter(pc.and_(pc.is_valid(vec.column("vector")), pc.is_in(vec.column("cid"), value_set=raw_cids)))
+        if vec.num_rows == 0:
+            return [], np.empty((0, 0), dtype=np.float32)
+        lengths = pc.list_value_length(vec.column("vector"))
+        counts = pc.value_counts(lengths)
+        dim = counts.field("values")[int(np.argmax(counts.field("counts").to_numpy()))].as_py()
+        if len(counts) > 1:
+            vec = vec.filter(pc.equal(lengths, dim))
+        col = vec.column("vector").combine_chunks()
+        mat = np.array(col.flatten().to_numpy(zero_copy_only=False).reshape(len(col), dim), dtype=np.float32)
+        mat /= np.sqrt(np.einsum("ij,ij->i", mat, mat))[:, None] + 1e-12
+        cids = [str(c) for c in vec.column("cid").to_pylist()]
+        self._write_vector_matrix(cids, mat, src_mtime_ns)
+        mat.flags.writeable = False
+        return cids, mat
+
+    def _write_vector_matrix(self, cids: List[str], mat: Any, src_mtime_ns: int) -> None:
+        import numpy as np
+
+        # cids first: the .npy mtime is what marks the pair fresh
+        suffix = f".tmp.{os.getpid()}.{int(time.time() * 1000)}"
+        cids_path = self.vec_matrix_path.with_suffix(".cids")
+        tmp_cids = cids_path.with_suffix(cids_path.suffix + suffix)
+        tmp_npy = self.vec_matrix_path.with_suffix(suffix + ".npy")
+        try:
+            tmp_cids.write_text("\n".join(cids), encoding="utf-8")
+            os.replace(tmp_cids, cids_path)
+            np.save(tmp_npy, mat)
+            os.utime(tmp_npy, ns=(src_mtime_ns, src_mtime_ns))
+            os.replace(tmp_npy, self.vec_matrix_path)
+        except Exception:
+            pass
+        finally:
+            for t in (tmp_cids, tmp_npy):
+                try:
+                    if os.path.exists(t):
+                        os.remove(t)
+                except Exception:
+                    pass
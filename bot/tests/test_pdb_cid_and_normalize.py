@@ -1,4 +1,4 @@
-from bot.pdb_cid import cid_from_object, is_valid_cid, canonical_json_bytes
+from bot.pdb_cid import cid_from_object, cid_from_bytes, is_valid_cid, canonical_json_bytes
 from bot.pdb_normalize import normalize_profile
 
 
@@ -28,3 +28,8 @@ def test_normalize_profile_fields():
     assert norm["mbti"] == "ISFJ"
     assert norm["socionics"] == "ESI"
     assert norm["big5"] == "SCOEI"
+
+
+def test_cid_from_bytes_matches_cid_from_object():
+    obj = {"name": "Sherlock", "id": 42}
+    assert cid_from_bytes(canonical_json_bytes(obj)) == cid_from_object(obj)
@@ -0,0 +1,76 @@
+from bot.pdb_cli import _count_new, _decode, _embed_text, _get_pid
+
+
+def test_decode_payload_variants():
+    assert _decode(b'{"id": 1, "name": "A"}') == {"id": 1, "name": "A"}
+    assert _decode('{"id": 2}') == {"id": 2}
+    d = {"id": 3}
+    assert _decode(d) is d
+    # non-object JSON and undecodable inputs map to None
+    assert _decode(b"[1, 2]") is None
+    assert _decode(b"not json") is None
+    assert _decode(None) is None
+
+
+def test_get_pid_key_order_and_types():
+    assert _get_pid({"profileId": "12", "id": None}) == 12
+    assert _get_pid({"id": 5, "profileId": 6}) == 5
+    assert _get_pid({"id": "abc", "profile_id": 7}) == 7
+    assert _get_pid({"name": "x"}) is None
+    assert _get_pid({"_profile_id": 3}) is None
+    assert _get_pid({"_profile_id": 3}, ("_profile_id",)) == 3
+
+
+def test_embed_text_name_aliases_and_context():
+    pb = b'{"name": "Alice", "_search_keyword": "wonderland"}'
+    assert _embed_text(pb) == "Alice"
+    assert _embed_text(pb, ["Alice", "Al"]) == "Alice | Al"
+    assert _embed_text(pb, include_context=True) == "Alice | wonderland"
+    # keyword stands in for a missing name; undecodable payloads are skipped
+    assert _embed_text(b'{"_keyword": "x"}') == "x"
+    assert _embed_text(b"not json") is None
+
+
+def test_count_new_matches_upsert_new_count(tmp_path, monkeypatch):
+    from importlib import reload
+
+    monkeypatch.setenv("SOCIONICS_DATA_DIR", str(tmp_path / "store"))
+    import bot.config as cfg
+    reload(cfg)
+    from bot.pdb_cli import _known_cids
+    from bot.pdb_storage import PdbStorage
+
+    store = PdbStorage()
+    store.upsert_raw([{"id": 1, "name": "A", "_source": "v2_search"}, {"name": "no id"}])
+    known = _known_cids(store)
+    # Re-seen content under new provenance keys is no progress, id or not
+    seen_again = [{"id": 1, "name": "A", "_source": "v2_related"}, {"name": "no id", "_keyword": "x"}]
+    assert _count_new(seen_again, known) == 0
+    # Changed content is a new cid even for a known profile id; repeats in a page count once
+    page = [{"id": 1, "name": "A2"}, {"id": 1, "name": "A2", "_keyword": "y"}, {"id": 2, "name": "B"}]
+    assert _count_new(page, set(known)) == 2
+    assert store.upsert_raw(page) == (2, 0)
+
+
+def test_scrape_v1_missing_dry_run(tmp_path, monkeypatch, capsys):
+    import sys
+    from importlib import reload
+
+    monkeypatch.setenv("SOCIONICS_DATA_DIR", str(tmp_path / "store"))
+    import bot.config as cfg
+    reload(cfg)
+    from bot import pdb_cli
+
+    pdb_cli._store.cache_clear()
+    try:
+        pdb_cli._store().upsert_raw(
+            [
+                {"id": 1, "name": "A"},
+                {"id": 2, "name": "B", "_source": "v1_profile", "_profile_id": 2},
+            ]
+        )
+        monkeypatch.setattr(sys, "argv", ["pdb-cli", "scrape-v1-missing", "--dry-run"])
+        pdb_cli.main()
+    finally:
+        pdb_cli._store.cache_clear()
+    assert "Missing v1 count: 1 (seen=2, have_v1=1)" in capsys.readouterr().out
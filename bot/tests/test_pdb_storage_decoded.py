@@ -0,0 +1,16 @@
+from bot.pdb_storage import _decoded_fields
+
+
+def test_decoded_fields_extracts_ids_and_name():
+    pb = b'{"_profile_id":"42","_source":"v1_profile","id":"7","name":"Alice"}'
+    assert _decoded_fields(pb) == (7, "Alice", "v1_profile", 42, 7)
+    assert _decoded_fields({"profileId": 9, "title": "T"}) == (9, "T", None, None, 9)
+    # out-of-range ids and undecodable payloads map to None
+    assert _decoded_fields({"id": 2**70}) == (None, None, None, None, None)
+    assert _decoded_fields(b"[1]") == (None, None, None, None, None)
+
+
+def test_decoded_fields_api_pid_is_digit_only_and_skips_profile_id():
+    assert _decoded_fields({"id": "-5"})[::4] == (-5, None)
+    assert _decoded_fields({"id": " 7"})[::4] == (7, None)
+    assert _decoded_fields({"_profile_id": 3})[::4] == (3, None)